@@ -0,0 +1,101 @@
+"""
+    Measures event-loop lag under a synthetic message flood.
+
+    Every fake message makes the storage calls the Leveling and Logger listeners make: the guild config, the
+    leveling state and the author's member row, created on first sight. They go through bot.database.MongoDatabase
+    with its collections swapped for in-memory ones that sleep for a round trip, either through Database.run as the
+    bot does or with run replaced by a direct call (the old behaviour, a blocking query inside the coroutine).
+
+    Usage: python benchmarks/event_loop_lag.py [messages] [round_trip_ms] [members]
+"""
+import asyncio
+import pathlib
+import random
+import statistics
+import sys
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bot.database import MongoDatabase, default_guild_document, default_leveling_document  # noqa: E402
+
+GUILD = types.SimpleNamespace(id=1, name="Benchmark", owner_id=1)
+
+
+class SlowCollection:
+    """The find_one and update_one calls the message path makes, with a fixed round trip"""
+    def __init__(self, round_trip, documents=()):
+        self.round_trip = round_trip
+        self.documents = {self._key(document): document for document in documents}
+
+    @staticmethod
+    def _key(query):
+        return query.get("_id", (query.get("guild_id"), query.get("user_id")))
+
+    def find_one(self, query, projection=None):
+        time.sleep(self.round_trip)
+        return self.documents.get(self._key(query))
+
+    def update_one(self, query, update, upsert=False):
+        time.sleep(self.round_trip)
+        if upsert and (key := self._key(query)) not in self.documents:
+            self.documents[key] = dict(update.get("$setOnInsert", {}))
+
+
+async def call_inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+async def measure_lag(stop: asyncio.Event, samples: list, interval=0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval) * 1000)
+
+
+async def message_path(database, user_id):
+    if not await database.get_guild_config(GUILD.id):
+        return
+    if not await database.get_leveling_state(GUILD.id):
+        return
+    if not await database.get_member(GUILD.id, user_id):
+        await database.add_member(GUILD.id, user_id)
+
+
+async def run(mode, messages, round_trip, members):
+    database = MongoDatabase("mongodb://127.0.0.1:27017/?serverSelectionTimeoutMS=1")
+    database.guilds = SlowCollection(round_trip, [default_guild_document(GUILD, "M!")])
+    database.leveling = SlowCollection(round_trip, [default_leveling_document(GUILD, 0)])
+    database.members = SlowCollection(round_trip)
+    if mode == "inline":
+        database.run = call_inline
+
+    authors = [random.randint(1, members) for _ in range(messages)]
+    samples = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_lag(stop, samples))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(message_path(database, user_id) for user_id in authors))
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor
+        database.close()
+
+    samples = sorted(samples) or [0.0]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{mode:>9} | {messages} msgs in {elapsed:6.2f}s | lag mean {statistics.mean(samples):8.2f}ms "
+          f"| p99 {p99:8.2f}ms | max {samples[-1]:8.2f}ms | {database.reads:,} reads")
+
+
+if __name__ == "__main__":
+    message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rtt = (float(sys.argv[2]) if len(sys.argv) > 2 else 2.0) / 1000
+    member_count = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    asyncio.run(run("inline", message_count, rtt, member_count))
+    asyncio.run(run("executor", message_count, rtt, member_count))
@@ -0,0 +1,70 @@
+"""
+    Startup guild reconciliation against a scratch database.
+
+    Times MongoDatabase.reconcile_guilds for a cold start (every document missing), a warm start (nothing to do)
+    and a start where some guilds were joined and left while the bot was offline, next to the per-guild find_one
+    and insert_one calls on_guild_join makes.
+
+    Needs MONGO_URI, the scratch database is dropped afterwards.
+
+    Usage: python benchmarks/guild_reconcile.py [guilds]
+"""
+import asyncio
+import os
+import pathlib
+import sys
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from bot.database import MongoDatabase  # noqa: E402
+
+DATABASE_NAME = "MatrixineReconcileBenchmark"
+
+
+def fake_guilds(start, count):
+    return [types.SimpleNamespace(id=guild_id, name=f"Guild {guild_id}", owner_id=guild_id + 10_000_000)
+            for guild_id in range(start, start + count)]
+
+
+async def timed(label, coroutine):
+    start = time.perf_counter()
+    result = await coroutine
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+async def join_one_by_one(database, guilds):
+    for guild in guilds:
+        await database.create_guild(guild, "M!", 0)
+
+
+async def main(count):
+    database = MongoDatabase(os.getenv("MONGO_URI"), name=DATABASE_NAME)
+    try:
+        await database.ensure_indexes()
+        guilds = fake_guilds(1, count)
+
+        await timed(f"on_guild_join loop, {count:,} guilds", join_one_by_one(database, guilds))
+        await database.run(database.client.drop_database, DATABASE_NAME)
+        await database.ensure_indexes()
+
+        await timed(f"reconcile cold, {count:,} guilds", database.reconcile_guilds(guilds, "M!", 0))
+        await timed(f"reconcile warm, {count:,} guilds", database.reconcile_guilds(guilds, "M!", 0))
+
+        changed = count // 10
+        guilds = guilds[changed:] + fake_guilds(count + 1, changed)
+        created, removed = await timed(f"reconcile {changed:,} joined, {changed:,} left",
+                                       database.reconcile_guilds(guilds, "M!", 0))
+        assert len(created) == len(removed) == changed
+    finally:
+        database.client.drop_database(DATABASE_NAME)
+        database.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5_000))
@@ -0,0 +1,59 @@
+"""
+    Leaderboard costs for a guild with many ranked members.
+
+    Compares the skip list backed bot.ranking.Leaderboard with sorting every member on each request, which is
+    what a leaderboard built from the stored member rows would have to do.
+
+    Usage: python benchmarks/leaderboard.py [members] [operations]
+"""
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bot.ranking import Leaderboard  # noqa: E402
+
+
+def timed(label, func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / repeat * 1e6:12.1f} us/op")
+
+
+if __name__ == "__main__":
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    xp = {user_id: float(random.randint(0, 1_000_000)) for user_id in range(members)}
+
+    start = time.perf_counter()
+    board = Leaderboard()
+    for user_id, value in xp.items():
+        board.update(user_id, value)
+    print(f"Built skip list board for {members:,} members in {time.perf_counter() - start:.2f}s")
+
+    user_ids = list(xp)
+
+    def award():
+        user_id = random.choice(user_ids)
+        xp[user_id] += 5
+        board.update(user_id, xp[user_id])
+
+    timed("skip list: XP update", award, operations)
+    timed("skip list: rank lookup", lambda: board.rank(random.choice(user_ids)), operations)
+    timed("skip list: page (10 rows, random)", lambda: board.page(random.randrange(members), 10), operations)
+
+    def sorted_rank():
+        user_id = random.choice(user_ids)
+        ordered = sorted(xp.items(), key=lambda item: (-item[1], item[0]))
+        return next(i for i, (uid, _) in enumerate(ordered) if uid == user_id) + 1
+
+    def sorted_page():
+        offset = random.randrange(members)
+        return sorted(xp.items(), key=lambda item: (-item[1], item[0]))[offset:offset + 10]
+
+    timed("sort per request: rank lookup", sorted_rank, max(1, operations // 100))
+    timed("sort per request: page (10 rows)", sorted_page, max(1, operations // 100))
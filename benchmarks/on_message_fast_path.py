@@ -0,0 +1,76 @@
+"""
+    Messages per second through Matrixine.on_message, with and without the prefix fast-reject.
+
+    The bot is built against a temporary SQLite database and never connects to Discord. Messages are plain
+    objects carrying the attributes on_message and get_context read. "before" runs the snapshot and then
+    process_commands for every message, which is what on_message did before the fast path. "after" runs
+    on_message itself.
+
+    Usage: python benchmarks/on_message_fast_path.py [messages] [command_percent]
+"""
+import asyncio
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+GUILD = types.SimpleNamespace(id=1, name="Benchmark", owner_id=1)
+CHAT = ["lol", "anyone up for a game later?", "m", "M", "that's what I said", "<@123> check this out",
+        "brb", "no way :O", "https://example.com/some/link", "gg"]
+
+
+def fake_messages(count, command_percent):
+    messages = []
+    for _ in range(count):
+        content = "M!rank" if random.random() * 100 < command_percent else random.choice(CHAT)
+        author = types.SimpleNamespace(id=random.randint(2, 500), bot=False)
+        messages.append(types.SimpleNamespace(content=content, author=author, guild=GUILD, _state=None,
+                                              channel=None))
+    return messages
+
+
+async def before(bot, msg):
+    bot.DATABASE.messages += 1
+    snapshot = await bot.snapshot_message(msg)
+    bot.dispatch("message_snapshot", msg, snapshot)
+    await bot.process_commands(msg)
+
+
+async def timed(label, handler, bot, messages):
+    start = time.perf_counter()
+    for msg in messages:
+        await handler(bot, msg)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {len(messages) / elapsed:12,.0f} messages/s {elapsed / len(messages) * 1e6:10.1f} us/message")
+
+
+async def main(count, command_percent):
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["STORAGE_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(directory, "benchmark.db")
+        os.environ["LOG_PATH"] = os.path.join(directory, "benchmark.log")
+        os.environ["LOG_LEVEL"] = "INFO"
+
+        from bot.bot import Matrixine
+
+        bot = Matrixine()
+        bot._connection.user = types.SimpleNamespace(id=1000)
+        try:
+            await bot.DATABASE.create_guild(GUILD, bot.PREFIX, bot.COLOR)
+            messages = fake_messages(count, command_percent)
+            await timed("before", before, bot, messages)
+            await timed("after", Matrixine.on_message, bot, messages)
+        finally:
+            await bot.AIOHTTP_SESSION.close()
+            bot.DATABASE.close()
+            bot.LOG_LISTENER.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 2.0))
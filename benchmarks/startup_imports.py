@@ -0,0 +1,41 @@
+"""
+    Import-time breakdown of a bot startup, from `python -X importtime`.
+
+    A fresh interpreter imports the bot package and then every cog in turn, the way setup_hook loads them. Each
+    cog's figure is what its own import added on top of everything imported before it, so heavy dependencies
+    that load lazily (scipy, PIL, pixelsort, pymep) should not show up at all.
+
+    Usage: python benchmarks/startup_imports.py [top_packages]
+"""
+import pathlib
+import subprocess
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from util.importtime import by_package, cumulative, parse_importtime  # noqa: E402
+
+
+def main(top):
+    cogs = sorted(path.stem for path in (ROOT / "bot" / "cogs").glob("*.py"))
+    statements = ["import bot.bot"] + [f"import bot.cogs.{cog}" for cog in cogs]
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "; ".join(statements)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    timings = parse_importtime(result.stderr)
+
+    total = sum(timing.cumulative_us for timing in timings if timing.depth == 0)
+    print(f"{len(timings):,} modules imported in {total / 1000:,.1f}ms")
+    print(f"{'bot.bot':<24} {cumulative(timings, 'bot.bot') / 1000:10.1f}ms")
+    for cog in sorted(cogs, key=lambda cog: cumulative(timings, f"bot.cogs.{cog}"), reverse=True):
+        print(f"{'cogs.' + cog:<24} {cumulative(timings, f'bot.cogs.{cog}') / 1000:10.1f}ms")
+
+    print("\nHeaviest packages (self time)")
+    for package, self_us in by_package(timings)[:top]:
+        print(f"{package:<24} {self_us / 1000:10.1f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
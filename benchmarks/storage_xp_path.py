@@ -0,0 +1,86 @@
+"""
+    The message -> XP path against each storage backend.
+
+    Every simulated message reads the leveling state and the author's member row the way Matrixine.snapshot_message
+    does, creates the row on first sight, and adds XP through the XPAccumulator, which is flushed every
+    flush_every messages. SQLite runs against a temporary file; MongoDB only runs when MONGO_URI is set and uses a
+    scratch database that is dropped afterwards.
+
+    Usage: python benchmarks/storage_xp_path.py [messages] [members] [flush_every]
+"""
+import asyncio
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+import types
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv  # noqa: E402
+
+from bot.database import MongoDatabase  # noqa: E402
+from bot.sqlite_database import SQLiteDatabase  # noqa: E402
+from bot.xp import XPAccumulator  # noqa: E402
+
+DATABASE_NAME = "MatrixineStorageBenchmark"
+GUILD = types.SimpleNamespace(id=1, name="Benchmark", owner_id=1)
+
+
+async def message_path(database, accumulator, user_id):
+    if not (state := await database.get_leveling_state(GUILD.id)):
+        return
+    if not (member := await database.get_member(GUILD.id, user_id)):
+        member = await database.add_member(GUILD.id, user_id)
+    accumulator.add_xp(GUILD.id, user_id, member, state.multiplier * 5.0)
+
+
+async def run(label, database, messages, members, flush_every):
+    await database.ensure_indexes()
+    await database.create_guild(GUILD, "M!", 0)
+    accumulator = XPAccumulator(database)
+    authors = [random.randint(1, members) for _ in range(messages)]
+
+    flush_time = 0.0
+    start = time.perf_counter()
+    for count, user_id in enumerate(authors, start=1):
+        await message_path(database, accumulator, user_id)
+        if count % flush_every == 0:
+            flush_start = time.perf_counter()
+            await accumulator.flush()
+            flush_time += time.perf_counter() - flush_start
+    await accumulator.flush()
+    elapsed = time.perf_counter() - start
+
+    stored = sum(xp for _, xp in await database.get_member_xp(GUILD.id))
+    assert stored == messages * 5.0, (stored, messages * 5.0)
+    print(f"{label:<8} {elapsed / messages * 1e6:10.1f} us/message  "
+          f"{flush_time / max(1, messages // flush_every) * 1000:8.2f} ms/flush  "
+          f"{messages / elapsed:10,.0f} messages/s")
+
+
+async def main(messages, members, flush_every):
+    with tempfile.TemporaryDirectory() as directory:
+        database = SQLiteDatabase(os.path.join(directory, "benchmark.db"))
+        try:
+            await run("sqlite", database, messages, members, flush_every)
+        finally:
+            database.close()
+
+    if not (uri := os.getenv("MONGO_URI")):
+        return print("MONGO_URI is not set, skipping MongoDB")
+    database = MongoDatabase(uri, name=DATABASE_NAME)
+    try:
+        await database.run(database.client.drop_database, DATABASE_NAME)
+        await run("mongo", database, messages, members, flush_every)
+    finally:
+        database.client.drop_database(DATABASE_NAME)
+        database.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = [int(arg) for arg in sys.argv[1:4]]
+    asyncio.run(main(*(args + [20_000, 1_000, 500][len(args):])))
@@ -1,19 +1,35 @@
 import asyncio
 import pprint
 import json
-import os
 import datetime as dt
+import logging
 import pathlib as pl
+import time
+import typing as t
 
 import aiohttp
 import discord
-from pymongo import MongoClient
 from discord.ext import commands
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
+from .cache import GuildConfigCache
+from .context import CURRENT_SNAPSHOT, MatrixineContext, MessageSnapshot
+from .database import open_database
+from .log_delivery import LogDelivery, WebhookPool
+from .logs import setup_logging
+from .message_store import MessageStore
+from .metrics import open_metrics
+from .monitoring import CommandLatencyMonitor, ListenerMonitor, LoopLagMonitor
+from .prefixes import PrefixMatcher
+from .ranking import RankIndex
+from .xp import XPAccumulator, XPCooldowns, XPLocks
+
+log = logging.getLogger(__name__)
+
 
 class Matrixine(commands.Bot):
     def __init__(self):
+        self.LOG_LISTENER = setup_logging()
         self.COLOR = 0x1EACC4
         self.OWNER_ID = [901689854411300904]
         self.OWNER_USERNAME = "zettabitep"
@@ -22,12 +38,25 @@ class Matrixine(commands.Bot):
         self.API_BASE = "https://discord.com/api/v9/"
         self.AIOHTTP_SESSION = aiohttp.ClientSession()
         self.APSCHEDULER = AsyncIOScheduler
-        self.MONGO_CLIENT = MongoClient(os.getenv("MONGO_URI"))
-        self.MONGO_DB = self.MONGO_CLIENT["MatrixineDB"]
+        self.DB_MONITOR = CommandLatencyMonitor()
+        self.DATABASE = open_database(event_listeners=[self.DB_MONITOR])
+        self.GUILD_CONFIGS = GuildConfigCache(self.DATABASE)
+        self.XP_ACCUMULATOR = XPAccumulator(self.DATABASE)
+        self.XP_LOCKS = XPLocks(self.DATABASE)
+        self.XP_COOLDOWNS = XPCooldowns()
+        self.RANKS = RankIndex(self.DATABASE)
+        self.LOG_WEBHOOKS = WebhookPool(self)
+        self.LOG_DELIVERY = LogDelivery(on_not_found=self.LOG_WEBHOOKS.forget)
+        self.MESSAGE_STORE = MessageStore()
+        self.LISTENER_MONITOR = ListenerMonitor()
+        self.LOOP_MONITOR = LoopLagMonitor()
+        self.METRICS = open_metrics(self.LISTENER_MONITOR)
         self.stdout_id = 1230708641481363538
         self.STDOUT = None
         self.BOT_INFO = None
         self.CLIENT_ID = None
+        self._reconciled = False
+        self._prefix_matchers: dict[t.Optional[int], PrefixMatcher] = {}
 
         self._cogs = [p.stem for p in pl.Path(".").glob("./bot/cogs/*.py")]
         super().__init__(command_prefix=self.prefix,
@@ -35,8 +64,9 @@ class Matrixine(commands.Bot):
                          case_insensitive=True,
                          intents=discord.Intents.all())
 
-    def log(self, msg):
-        print(f"[{dt.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}] | {msg}")
+    def log(self, msg, level: int = logging.INFO, **fields):
+        """Logs through the queue set up by bot.logs, keyword arguments become fields of the JSON line"""
+        log.log(level, msg, extra=fields)
 
     @property
     def latency(self):
@@ -44,22 +74,100 @@ class Matrixine(commands.Bot):
 
     async def setup_hook(self):
         self.log("Beginning Setup...")
-
-        for cog in self._cogs:
-            await self.load_extension(f"bot.cogs.{cog}")
-            self.log(f"Loaded {cog} cog...")
+        self.LOOP_MONITOR.start()
+        await self.DATABASE.ensure_indexes()
+        self.GUILD_CONFIGS.start()
+        self.XP_ACCUMULATOR.start()
+        await self.XP_LOCKS.load()
+        self.XP_LOCKS.start()
+        if self.METRICS:
+            try:
+                await self.METRICS.start()
+            except OSError as exc:
+                self.log(f"Metrics endpoint could not listen on port {self.METRICS.port}: {exc}", logging.WARNING)
+                self.METRICS = None
+
+        start = time.perf_counter()
+        # Cogs do not depend on each other, their setup() and cog_load() awaits overlap
+        timings = await asyncio.gather(*(self.load_cog(cog) for cog in self._cogs))
+        slowest = sorted(timings, key=lambda entry: entry[1], reverse=True)
+        profile = ", ".join(f"{cog} {ms:,.0f}ms" for cog, ms in slowest)
+        self.log(f"Loaded {len(timings)} cogs in {(time.perf_counter() - start) * 1000:,.0f}ms ({profile})",
+                 cogs=dict(timings))
 
         self.log("Setup finished...")
 
+    async def load_cog(self, cog: str) -> tuple[str, float]:
+        """Loads one cog, returns its name and how long its import and setup took in milliseconds"""
+        start = time.perf_counter()
+        await self.load_extension(f"bot.cogs.{cog}")
+        return cog, (time.perf_counter() - start) * 1000
+
+    async def reload_cog(self, cog: str) -> list[str]:
+        """
+            Reloads a cog's module in place, without touching the gateway session.
+
+            Cogs with state that lives on the cog instance rather than the bot define export_state(), which is
+            called before the old instance is unloaded, and import_state(state), which the new instance gets right
+            after it is loaded. If the new module fails to load, discord.py puts the old one back and that instance
+            gets the state instead.
+
+            Args:
+                cog (str): The module name in bot.cogs.
+
+            Returns:
+                list[str]: The cogs whose state was carried over.
+        """
+        extension = f"bot.cogs.{cog}"
+        states = {name: instance.export_state() for name, instance in self.cogs.items()
+                  if instance.__module__ == extension and hasattr(instance, "export_state")}
+        try:
+            await self.reload_extension(extension)
+        finally:
+            for name, state in states.items():
+                if (instance := self.get_cog(name)) and hasattr(instance, "import_state"):
+                    await discord.utils.maybe_coroutine(instance.import_state, state)
+        return list(states)
+
     def run(self, **kwargs):
         self.log("Running Bot...")
-        super().run(token=kwargs["token"], reconnect=True)
+        # discord.py's own handler would write to stdout from the loop, its logger goes through ours instead
+        super().run(token=kwargs["token"], reconnect=True, log_handler=None)
 
     async def close(self):
         self.log("Closing connection to Discord...")
-        self.MONGO_CLIENT.close()
+        if self.METRICS:
+            await self.METRICS.close()
+        await self.LOG_DELIVERY.close()
+        await self.LOOP_MONITOR.close()
+        await self.XP_ACCUMULATOR.close()
+        await self.XP_LOCKS.close()
+        await self.GUILD_CONFIGS.close()
+        self.DATABASE.close()
         await self.AIOHTTP_SESSION.close()
         await super().close()
+        self.LOG_LISTENER.stop()
+
+    async def _run_event(self, coro, event_name, *args, **kwargs):
+        # discord.py's own _run_event, timed per listener for LISTENER_MONITOR
+        owner = getattr(coro, "__self__", None)
+        if isinstance(owner, commands.Cog):
+            cog = owner.qualified_name
+        else:
+            cog = "bot" if owner is self else getattr(coro, "__module__", "-").rpartition(".")[2]
+        start = time.perf_counter_ns()
+        try:
+            await coro(*args, **kwargs)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.LISTENER_MONITOR.record(cog, event_name, (time.perf_counter_ns() - start) // 1000, True)
+            try:
+                await self.on_error(event_name, *args, **kwargs)
+            except asyncio.CancelledError:
+                pass
+            return
+        self.LISTENER_MONITOR.record(cog, event_name, (time.perf_counter_ns() - start) // 1000)
 
     async def on_connect(self):
         self.log(f"Bot connected to Discord API. Latency: {self.latency}")
@@ -71,9 +179,10 @@ class Matrixine(commands.Bot):
         raise
 
     async def on_command_error(self, ctx: commands.Context, exc):
-        self.log(f"Encountered error while running '{ctx.command}' from {ctx.guild.name} ({ctx.guild.id})")
+        guild = f"{ctx.guild.name} ({ctx.guild.id})" if ctx.guild else "DMs"
+        self.log(f"Encountered error while running '{ctx.command}' from {guild}", logging.WARNING,
+                 command=str(ctx.command), guild=ctx.guild.id if ctx.guild else None, error=type(exc).__name__)
         if isinstance(exc, commands.MissingRequiredArgument):
-            self.log("Error: MissingRequiredArgument")
             await ctx.send("You're missing a required argument!")
             return
         elif hasattr(exc, "original"):
@@ -89,29 +198,97 @@ class Matrixine(commands.Bot):
             f"`{dt.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}` | Bot ready! Latency: {self.latency}.")
         self.log(f"Bot ready... Latency: {self.latency}")
         await self.get_bot_info()
-
-    def prefix(self, bot, msg):
-        result = self.MONGO_DB["Guilds"].find_one({"_id": msg.guild.id})
-        if result:
-            prefix = str(result["server_prefix"])
+        # on_ready fires again after every reconnect that needs a new session, the guild list only needs checking once
+        if not self._reconciled:
+            self._reconciled = True
+            await self.reconcile_guilds()
+
+    async def reconcile_guilds(self):
+        if not self.guilds:
+            # An empty guild list on startup means Discord did not deliver it, not that every guild was left
+            return self.log("No guilds received, skipping guild reconciliation")
+        start = time.perf_counter()
+        created, removed = await self.DATABASE.reconcile_guilds(self.guilds, self.PREFIX, self.COLOR)
+        for guild_id in created + removed:
+            self.GUILD_CONFIGS.invalidate(guild_id)
+        for guild_id in removed:
+            self.RANKS.drop(guild_id)
+            self.XP_COOLDOWNS.forget(guild_id)
+            self.MESSAGE_STORE.forget(guild_id)
+            self.XP_ACCUMULATOR.forget(guild_id)
+        self.log(f"Reconciled {len(self.guilds):,} guilds in {(time.perf_counter() - start) * 1000:,.1f}ms "
+                 f"({len(created):,} created, {len(removed):,} removed)")
+
+    async def prefix(self, bot, msg):
+        snapshot = CURRENT_SNAPSHOT.get()
+        if snapshot and snapshot.guild:
+            config = snapshot.guild
+        elif msg.guild:
+            config = await self.GUILD_CONFIGS.get(msg.guild.id)
         else:
-            prefix = self.PREFIX
-
-        prefixes = commands.when_mentioned_or(prefix)(bot, msg)
-        prefixes.append(prefix.lower())
-        return prefixes
+            config = None
+        return self.prefix_matcher(msg.guild, config).command_prefix(msg.content)
+
+    def rebuild_prefix_matcher(self, guild_id: t.Optional[int], prefixes: t.Sequence[str]) -> PrefixMatcher:
+        matcher = self._prefix_matchers[guild_id] = PrefixMatcher(prefixes, self.user.id)
+        return matcher
+
+    def prefix_matcher(self, guild, config) -> PrefixMatcher:
+        """Returns the cached matcher for the guild, rebuilt if its prefixes changed since it was compiled"""
+        guild_id = guild.id if guild else None
+        prefixes = config.prefixes if config else (self.PREFIX,)
+        if (matcher := self._prefix_matchers.get(guild_id)) and matcher.prefixes == prefixes:
+            return matcher
+        return self.rebuild_prefix_matcher(guild_id, prefixes)
+
+    def may_be_command(self, msg, snapshot: MessageSnapshot) -> bool:
+        return self.prefix_matcher(msg.guild, snapshot.guild).match(msg.content) is not None
+
+    def may_earn_xp(self, msg, leveling) -> bool:
+        return not (self.XP_LOCKS.is_locked(msg.guild.id, msg.author.id)
+                    or self.XP_COOLDOWNS.is_cooling(msg.guild.id, msg.author.id, leveling.xp_cooldown))
+
+    async def snapshot_message(self, msg) -> MessageSnapshot:
+        snapshot = MessageSnapshot()
+        CURRENT_SNAPSHOT.set(snapshot)
+        if msg.guild:
+            snapshot.guild = await self.GUILD_CONFIGS.get(msg.guild.id)
+        # Both cheap checks run on cached state before the one database read a message can cost
+        snapshot.may_be_command = self.may_be_command(msg, snapshot)
+        if not (snapshot.guild and snapshot.guild.leveling_enabled):
+            return snapshot
+
+        snapshot.leveling = await self.GUILD_CONFIGS.get_leveling(msg.guild.id)
+        # The member row is only read for messages that will earn XP, locked members and members on cooldown are
+        # skipped, and commands that need the row fall back to a direct lookup
+        if snapshot.leveling and self.may_earn_xp(msg, snapshot.leveling):
+            snapshot.member = await self.DATABASE.get_member(msg.guild.id, msg.author.id)
+        return snapshot
 
     async def process_commands(self, msg):
-        ctx = await self.get_context(msg, cls=commands.Context)
+        ctx = await self.get_context(msg, cls=MatrixineContext)
 
         if ctx.command is not None:
-            self.log(f"Processing command, '{ctx.command.name}', "
-                     f"from {ctx.guild.name} ({ctx.guild.id})")
+            start = time.perf_counter()
             await self.invoke(ctx)
+            latency = (time.perf_counter() - start) * 1000
+            guild = f"{ctx.guild.name} ({ctx.guild.id})" if ctx.guild else "DMs"
+            # Debug, the one line per message-rate event, so LOG_SAMPLE can thin it out without touching the rest
+            self.log(f"Processed command '{ctx.command.name}' from {guild} in {latency:,.1f}ms", logging.DEBUG,
+                     command=ctx.command.qualified_name, guild=ctx.guild.id if ctx.guild else None,
+                     user=ctx.author.id, latency_ms=round(latency, 2))
 
     async def on_message(self, msg):
-        if not msg.author.bot:
-            await self.process_commands(msg)
+        if msg.author.bot:
+            return
+
+        self.DATABASE.messages += 1
+        snapshot = await self.snapshot_message(msg)
+        self.dispatch("message_snapshot", msg, snapshot)
+        # Most messages are chat, those never reach get_context
+        if not snapshot.may_be_command:
+            return
+        await self.process_commands(msg)
 
     def get_command_info(self, cmd):
         command_info = {
@@ -0,0 +1,108 @@
+import asyncio
+import typing as t
+
+from .database import Database, GuildConfig, LevelingState, apply_set
+
+
+class GuildConfigCache:
+    """
+        In-memory copy of the Guilds collection, and of each guild's leveling settings.
+
+        Each guild document is loaded once and served from memory afterwards. Setters write through to the
+        database, and entries are invalidated from a change stream, or by polling when the backend does not
+        support change streams (standalone MongoDB deployments, SQLite). Leveling settings are only written by
+        the bot's own setters, the poll drops them so they are re-read at most once per interval.
+    """
+    def __init__(self, database: Database, poll_interval: float = 60.0):
+        self.database = database
+        self.poll_interval = poll_interval
+        self._configs: dict[int, t.Optional[GuildConfig]] = {}
+        self._pending: dict[int, asyncio.Future] = {}
+        self._leveling: dict[int, t.Optional[LevelingState]] = {}
+        self._leveling_pending: dict[int, asyncio.Future] = {}
+        self._watcher: t.Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __contains__(self, guild_id: int):
+        return guild_id in self._configs
+
+    def get_cached(self, guild_id: int) -> t.Optional[GuildConfig]:
+        return self._configs.get(guild_id)
+
+    async def get(self, guild_id: int) -> t.Optional[GuildConfig]:
+        if guild_id in self._configs:
+            return self._configs[guild_id]
+        return await self._load(guild_id, self._configs, self._pending, self.database.get_guild_config)
+
+    async def get_leveling(self, guild_id: int) -> t.Optional[LevelingState]:
+        if guild_id in self._leveling:
+            return self._leveling[guild_id]
+        return await self._load(guild_id, self._leveling, self._leveling_pending, self.database.get_leveling_state)
+
+    async def _load(self, guild_id: int, cache: dict, pending: dict[int, asyncio.Future], query):
+        # Concurrent misses for the same guild share one query
+        if guild_id in pending:
+            return await asyncio.shield(pending[guild_id])
+
+        future = asyncio.get_running_loop().create_future()
+        pending[guild_id] = future
+        try:
+            value = await query(guild_id)
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            cache[guild_id] = value
+            future.set_result(value)
+            return value
+        finally:
+            del pending[guild_id]
+
+    async def update(self, guild_id: int, changes: dict):
+        await self.database.update_guild_config(guild_id, changes)
+        if config := self._configs.get(guild_id):
+            apply_set(config.document, changes)
+
+    async def update_leveling(self, guild_id: int, changes: dict):
+        await self.database.update_leveling_state(guild_id, changes)
+        if state := self._leveling.get(guild_id):
+            apply_set(state.document, changes)
+
+    def invalidate(self, guild_id: t.Optional[int] = None):
+        if guild_id is None:
+            self._configs.clear()
+            self._leveling.clear()
+        else:
+            self._configs.pop(guild_id, None)
+            self._leveling.pop(guild_id, None)
+
+    def start(self):
+        if not self._watcher:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def close(self):
+        self._closed = True
+        self.database.stop_following_guild_changes()
+        if self._watcher:
+            self._watcher.cancel()
+
+    async def _watch(self):
+        loop = asyncio.get_running_loop()
+        # Runs on its own thread; following the changes blocks until the stream is closed
+        await loop.run_in_executor(None, self.database.follow_guild_changes,
+                                   lambda guild_id: loop.call_soon_threadsafe(self.invalidate, guild_id))
+        if not self._closed:
+            await self._poll()
+
+    async def _poll(self):
+        while not self._closed:
+            await asyncio.sleep(self.poll_interval)
+            self._leveling.clear()
+            if not (guild_ids := list(self._configs)):
+                continue
+            found = await self.database.get_guild_documents(guild_ids)
+            for guild_id in guild_ids:
+                if guild_id in self._pending:
+                    continue
+                self._configs[guild_id] = GuildConfig(found[guild_id]) if guild_id in found else None
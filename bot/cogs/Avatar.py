@@ -6,21 +6,28 @@ from urllib.parse import quote
 
 import discord
 import requests
-from PIL import Image
 from discord.ext import commands
-from pixelsort import pixelsort as pxs
+
+import util
 
 
 class Avatar(commands.Cog):
     """Some interesting commands to mess around with a user's profile picture!"""
     def __init__(self, bot):
         self.bot = bot
+        self._imports = None
+
+    async def cog_load(self):
+        self._imports = util.import_in_background("PIL.Image", "pixelsort", "pixelsort.sorting")
 
     @commands.command(name="glitch", description="Messes with the user's pfp to add a glitchy look")
     async def glitch_avatar_command(self, ctx: commands.Context, target: t.Optional[discord.User]):
         if target is None:
             target = ctx.author
 
+        await self._imports
+        from PIL import Image
+        from pixelsort import pixelsort as pxs
         async with ctx.typing():
             re = requests.get(f"{target.avatar.url}".replace("webp", "png").replace("gif", "png"))
             img = Image.open(io.BytesIO(re.content))
@@ -58,6 +65,9 @@ class Avatar(commands.Cog):
         if 0 > low_threshold or low_threshold > 1:
             return await ctx.send("The lower threshold must be within 0 and 1!")
 
+        await self._imports
+        from PIL import Image
+        from pixelsort import pixelsort as pxs
         from pixelsort.sorting import choices
         choices = list(choices.keys())
         if sort is None:
@@ -5,7 +5,7 @@ import discord
 from discord.ext.menus import MenuPages, ListPageSource
 from discord.ext import commands
 
-DENY_COGS = ["WebsiteUpkeep"]
+DENY_COGS = ["WebsiteUpkeep", "Owner"]
 
 def syntax(command):
     cmd_and_aliases = "|".join([str(command), *command.aliases])
@@ -66,7 +66,7 @@ class Help(commands.Cog):
 
     @commands.command(name="help", aliases=["h"], description="Shows this message")
     async def show_help(self, ctx, module: t.Optional[str], *, command: t.Optional[str]):
-        prefix = self.bot.MONGO_DB["Guilds"].find_one(ctx.guild.id)["server_prefix"]
+        prefix = ctx.snapshot.guild.prefix if ctx.snapshot.guild else self.bot.PREFIX
 
         # Module not supplied
         if not module:
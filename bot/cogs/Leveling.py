@@ -1,13 +1,41 @@
+import asyncio
 import datetime as dt
 import random as r
 import math
 import typing as t
-import pytz
 
 from discord.ext import commands
+from discord.ext.menus import MenuPages, PageSource
 import discord
 
 import util
+from util import leveling_math
+
+
+class LeaderboardMenu(PageSource):
+    def __init__(self, ctx, board, bot, per_page=10):
+        self.ctx = ctx
+        self.board = board
+        self.bot = bot
+        self.per_page = per_page
+
+    def is_paginating(self):
+        return len(self.board) > self.per_page
+
+    def get_max_pages(self):
+        return max(1, math.ceil(len(self.board) / self.per_page))
+
+    async def get_page(self, page_number):
+        return self.board.page(page_number * self.per_page, self.per_page)
+
+    async def format_page(self, menu, entries):
+        lines = [f"**{util.ordinal_suffix(rank)}** <@{user_id}> | {xp:,.0f} XP" for rank, user_id, xp in entries]
+        embed = discord.Embed(title=f"{self.ctx.guild.name} leaderboard",
+                              description="\n".join(lines),
+                              color=self.bot.COLOR, timestamp=dt.datetime.now())
+        embed.set_footer(text=f"Page {menu.current_page + 1:,} of {self.get_max_pages():,} | "
+                              f"{len(self.board):,} ranked members")
+        return embed
 
 
 class Leveling(commands.Cog):
@@ -15,17 +43,25 @@ class Leveling(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.database = self.bot.MONGO_DB
-        self.leveling = self.database["Leveling"]
-        self.guilds = self.database["Guilds"]
-
-    async def level_up_msg(self, msg: discord.Message, old_level, new_level):
-        if not (embed_settings := self.leveling.find_one(msg.guild.id)["embed_settings"]):
+        self.database = self.bot.DATABASE
+        self.guild_configs = self.bot.GUILD_CONFIGS
+        self.accumulator = self.bot.XP_ACCUMULATOR
+        self.ranks = self.bot.RANKS
+        self.locks = self.bot.XP_LOCKS
+        self.cooldowns = self.bot.XP_COOLDOWNS
+
+    async def get_member(self, ctx, target: discord.Member) -> t.Optional[dict]:
+        if target == ctx.author and ctx.snapshot.member is not None:
+            return ctx.snapshot.member
+        return await self.database.get_member(ctx.guild.id, target.id)
+
+    async def level_up_msg(self, msg: discord.Message, snapshot, old_level, new_level):
+        if not (embed_settings := dict(snapshot.leveling.embed_settings)):
             return
         if not embed_settings["title"] and not embed_settings["desc"]:
             return
 
-        if not (level_up_channel_id := self.guilds.find_one(msg.guild.id)['data']['member']['level_up_channel']):
+        if not (level_up_channel_id := snapshot.guild.level_up_channel):
             return
 
         level_up_channel = self.bot.get_channel(int(level_up_channel_id))
@@ -54,126 +90,109 @@ class Leveling(commands.Cog):
             ctx = await self.bot.get_context(message=msg)
             await ctx.send(embed=embed)
 
-    async def process_xp(self, msg: discord.Message):
+    async def process_xp(self, msg: discord.Message, snapshot):
         user = msg.author
         guild = msg.guild
-        if not (result := self.leveling.find_one(guild.id)):
+        if not snapshot.guild or not snapshot.guild.leveling_enabled:
             return
-        if not self.guilds.find_one(guild.id)['data']['member']['leveling_enabled']:
+        if not (state := snapshot.leveling):
             return
 
-        members = result['members']
-        try:
-            member = members[str(user.id)]
-        except KeyError:
-            members[str(user.id)] = {
-                "xp": 0,
-                "level": 0,
-                "lock_reason": None,
-                "lock_time": dt.datetime.now(pytz.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "times_locked": 0
-            }
-            self.leveling.update_one({"_id": guild.id}, {"$set": {"members": members}})
-            member = members[str(user.id)]
-
-        lock_time = dt.datetime.strptime(member["lock_time"], "%Y-%m-%dT%H:%M:%SZ")
+        if self.locks.is_locked(guild.id, user.id):
+            return
+        if not self.cooldowns.acquire(guild.id, user.id, state.xp_cooldown):
+            return
 
-        if lock_time < dt.datetime.now():
-            await self.add_xp(msg, result)
+        if not snapshot.member:
+            snapshot.member = await self.database.add_member(guild.id, user.id)
 
-        elif lock_time < dt.datetime.now(pytz.utc):
-            lock_reason = member["lock_reason"]
-            lock_reason = f"NO LONGER LOCKED | {lock_reason}"
-            self.leveling.update_one({"_id": guild.id}, {"$set": {f"member.{user.id}.lock_reason": lock_reason}})
+        await self.add_xp(msg, snapshot)
 
-    async def add_xp(self, msg, result):
-        xp_to_add = result["multiplier"] * (float(r.randint(1, 10)) if result["randomized"] else 5.0)
+    async def add_xp(self, msg, snapshot):
+        state = snapshot.leveling
+        xp_to_add = state.multiplier * (float(r.randint(1, 10)) if state.randomized else 5.0)
 
-        member = result["members"][str(msg.author.id)]
+        member = self.accumulator.add_xp(msg.guild.id, msg.author.id, snapshot.member, xp_to_add)
 
-        xp = member["xp"] + xp_to_add
+        xp = member["xp"]
         current_level = member['level']
+        self.ranks.update(msg.guild.id, msg.author.id, xp)
 
-        self.leveling.update_one({"_id": msg.guild.id}, {"$set": {f"members.{str(msg.author.id)}.xp": xp}})
-
-        if (new_level := math.floor(int(xp // 42) ** 0.55)) > current_level:
-            self.leveling.update_one({"_id": msg.guild.id},
-                                     {"$set": {f"members.{str(msg.author.id)}.level": new_level}})
-            await self.level_up_msg(msg, current_level, new_level)
+        if (new_level := leveling_math.level_for_xp(xp, state.curve)) > current_level:
+            self.accumulator.set_level(msg.guild.id, msg.author.id, new_level)
+            await self.level_up_msg(msg, snapshot, current_level, new_level)
 
     @commands.Cog.listener()
-    async def on_message(self, msg):
-        if msg.author.bot:
-            return
-        await self.process_xp(msg)
+    async def on_message_snapshot(self, msg, snapshot):
+        await self.process_xp(msg, snapshot)
 
     @commands.command(name="set_level_up_embed_title", aliases=["SetLevelUpEmbedTitle"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_title(self, ctx, *, title: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result['data']['member']['leveling_enabled']:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabstr(target.id)led on this server")
 
         if not title:
-            if not (level_title := self.leveling.find_one(ctx.guild.id)["embed_settings"]["title"]):
+            if not (level_title := ctx.snapshot.leveling.embed_settings["title"]):
                 return await ctx.send("There is no level up embed title for this server")
             return await ctx.send(f"The current level up embed title is:\n`{level_title}`")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.title": title}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.title": title})
         await ctx.send(f"The new level up embed title has been set to:\n`{title}`")
 
     @commands.command(name="set_level_up_embed_description", aliases=["SetLevelUpEmbedDescription"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_description(self, ctx, *, desc: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result['data']['member']['leveling_enabled']:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server!")
 
         if not desc:
-            if not (level_desc := self.leveling.find_one(ctx.guild.id)["embed_settings"]["desc"]):
+            if not (level_desc := ctx.snapshot.leveling.embed_settings["desc"]):
                 return await ctx.send("There is no level up embed description for this server")
             return await ctx.send(f"The current level up embed description is:\n`{level_desc}`")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.desc": desc}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.desc": desc})
         await ctx.send(f"The new level up embed description has been set to:\n`{desc}`")
 
     @commands.command(name="set_level_up_embed_color", aliases=["SetLevelUpEmbedColor"],
                       description="Sets the color of the level up embed. ACCEPTS ONLY HEX (ex. 0x1EACC4 or 1EACC4")
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_color(self, ctx, color: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result['data']['member']['leveling_enabled']:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server")
 
         if not color:
-            if not (level_color := self.leveling.find_one(ctx.guild.id)["embed_settings"]["color"]):
+            if not (level_color := ctx.snapshot.leveling.embed_settings["color"]):
                 return await ctx.send("There is no level up embed color for this server")
             return await ctx.send(f"The current level up embed color is `{level_color}`")
 
-        self.leveling.update_one({"_id": ctx.guild.id},
-                                 {"$set": {"embed_settings.color": hex(int(color.strip("0x"), 16))}})
+        await self.guild_configs.update_leveling(ctx.guild.id,
+                                                 {"embed_settings.color": hex(int(color.strip("0x"), 16))})
         await ctx.send(f"The new level up embed color has been set to 0x`{color}`")
 
     @commands.command(name="set_level_up_embed_thumbnail",
                       aliases=["SetLevelUpEmbedThumbnail", "SLUE_Thumbnail", "SLUET"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_thumbnail(self, ctx, *, thumbnail_url: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server")
 
         if not thumbnail_url:
-            if not (level_thumbnail := self.leveling.find_one(ctx.guild.id)["embed_settings"]["thumbnail"]):
+            if not (level_thumbnail := ctx.snapshot.leveling.embed_settings["thumbnail"]):
                 return await ctx.send("There is not level up thumbnail for this server")
             if thumbnail_file := await util.url_to_discord_file(level_thumbnail, f"{ctx.guild.name}_LUE_thumbnail.png"):
                 return await ctx.send(f"The current level up thumbnail is:", file=thumbnail_file)
             return await ctx.send(f"The current level up thumbnail is <{level_thumbnail}>")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.thumbnail": thumbnail_url}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.thumbnail": thumbnail_url})
         if thumbnail_file := await util.url_to_discord_file(thumbnail_url, f"{ctx.guild.name}_LUE_thumbnail.png"):
             return await ctx.send(f"Updated the level up thumbnail to:", file=thumbnail_file)
         await ctx.send(f"Updated the level up thumbnail to <{thumbnail_url}>")
@@ -181,19 +200,19 @@ class Leveling(commands.Cog):
     @commands.command(name="set_level_up_embed_image", aliases=["SetLevelUpEmbedImage", "SLUE_Image", "SLUEI"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_image(self, ctx, *, image_url: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server")
 
         if not image_url:
-            if not (level_image := self.leveling.find_one(ctx.guild.id)["embed_settings"]["image"]):
+            if not (level_image := ctx.snapshot.leveling.embed_settings["image"]):
                 return await ctx.send("There is not level up image for this server")
             if image_file := await util.url_to_discord_file(level_image, f"{ctx.guild.name}_LUE_image.png"):
                 return await ctx.send(f"The current level up image is:", file=image_file)
             return await ctx.send(f"The current level up image is <{level_image}>")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.thumbnail": image_url}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.thumbnail": image_url})
         if image_file := await util.url_to_discord_file(image_url, f"{ctx.guild.name}_LUE_image.png"):
             return await ctx.send(f"Updated the level up image to:", file=image_file)
         await ctx.send(f"Updated the level up image to <{image_url}>")
@@ -201,33 +220,33 @@ class Leveling(commands.Cog):
     @commands.command(name="set_level_up_embed_footer", aliases=["SetLevelUpEmbedFooter"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_footer(self, ctx, *, footer: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result['data']['member']['leveling_enabled']:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server!")
 
         if not footer:
-            if not (level_footer := self.leveling.find_one(ctx.guild.id)["embed_settings"]["footer"]):
+            if not (level_footer := ctx.snapshot.leveling.embed_settings["footer"]):
                 return await ctx.send("There is no level up embed footer for this server")
             return await ctx.send(f"The current level up embed footer is:\n`{level_footer}`")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.footer": footer}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.footer": footer})
         await ctx.send(f"The new level up embed footer has been set to:\n`{footer}`")
 
     @commands.command(name="set_level_up_embed_author", aliases=["SetLevelUpEmbedAuthor"])
     @commands.has_permissions(manage_guild=True)
     async def set_level_up_embed_author(self, ctx, *, author: t.Optional[str]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result['data']['member']['leveling_enabled']:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server!")
 
         if not author:
-            if not (level_author := self.leveling.find_one(ctx.guild.id)["embed_settings"]["author"]):
+            if not (level_author := ctx.snapshot.leveling.embed_settings["author"]):
                 return await ctx.send("There is no level up embed author for this server")
             return await ctx.send(f"The current level up embed author is:\n`{level_author}`")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"embed_settings.author": author}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"embed_settings.author": author})
         await ctx.send(f"The new level up embed author has been set to:\n`{author}`")
 
     @commands.command(name="level_embed_info", aliases=["level_embed_help", "LevelEmbedInfo", "LevelEmbedHelp"],
@@ -264,99 +283,196 @@ class Leveling(commands.Cog):
                       description="How much XP should users gain from speaking. 0.5 -> Half XP. 1 -> Default. 2 -> Double")
     @commands.has_permissions(manage_guild=True)
     async def set_level_multiplier_command(self, ctx, multiplier: t.Optional[float]):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("This server does not have leveling enabled")
+        if not (state := ctx.snapshot.leveling):
+            return
         if not multiplier:
-            multiplier = self.leveling.find_one(ctx.guild.id)["multiplier"]
-            return await ctx.send(f"The server's XP multiplier is {multiplier}")
+            return await ctx.send(f"The server's XP multiplier is {state.multiplier}")
         if multiplier < 0:
             return await ctx.send("Please supply a positive number. Negative multiplier would take away XP")
         if multiplier == 0:
             return await ctx.send("Please supply a non-zero number. If you don't want users to gain XP, disable leveling")
+        if multiplier > leveling_math.MAX_MULTIPLIER:
+            return await ctx.send(f"The multiplier can be at most {leveling_math.MAX_MULTIPLIER:g}")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {"multiplier": multiplier}})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"multiplier": multiplier})
         await ctx.send(f"Alright, the XP multiplier is set to {multiplier}")
 
+    @commands.command(name="set_xp_cooldown", aliases=["SetXPCooldown"],
+                      description="How long users have to wait between messages that give XP. 0 -> Every message")
+    @commands.has_permissions(manage_guild=True)
+    async def set_xp_cooldown_command(self, ctx, cooldown: t.Optional[str]):
+        if not (config := ctx.snapshot.guild):
+            return
+        if not config.leveling_enabled:
+            return await ctx.send("This server does not have leveling enabled")
+        if not (state := ctx.snapshot.leveling):
+            return
+        if cooldown is None:
+            if not state.xp_cooldown:
+                return await ctx.send("This server has no XP cooldown, every message gives XP")
+            return await ctx.send(f"The server's XP cooldown is "
+                                  f"{util.timedelta_to_string(dt.timedelta(seconds=state.xp_cooldown))}")
+
+        seconds = float(cooldown) if cooldown.replace(".", "", 1).isdigit() else util.time_string_to_seconds(cooldown)
+        if not seconds and cooldown.strip("0."):
+            return await ctx.send("Please supply a number of seconds or a duration like `30s` or `1m30s`")
+        await self.guild_configs.update_leveling(ctx.guild.id, {"xp_cooldown": seconds})
+        if not seconds:
+            return await ctx.send("Alright, the XP cooldown is off, every message gives XP")
+        await ctx.send(f"Alright, users now gain XP at most once every "
+                       f"{util.timedelta_to_string(dt.timedelta(seconds=seconds))}")
+
+    @commands.command(name="recalculate_levels", aliases=["RecalculateLevels"],
+                      description="Recalculates every member's level from their XP. "
+                                  "Optionally sets a new level curve first (default 0.55, higher levels up faster)")
+    @commands.has_permissions(manage_guild=True)
+    async def recalculate_levels_command(self, ctx, curve: t.Optional[float]):
+        if not (config := ctx.snapshot.guild):
+            return
+        if not config.leveling_enabled:
+            return await ctx.send("This server does not have leveling enabled")
+        if not (state := ctx.snapshot.leveling):
+            return
+        if curve is not None and not leveling_math.MIN_CURVE <= curve <= leveling_math.MAX_CURVE:
+            return await ctx.send(f"The curve has to be between {leveling_math.MIN_CURVE} "
+                                  f"and {leveling_math.MAX_CURVE}")
+
+        loop = asyncio.get_running_loop()
+        async with ctx.typing():
+            if curve is not None:
+                # Built before the curve is saved, so messages never find a curve without its table
+                await loop.run_in_executor(None, leveling_math.thresholds, curve)
+                await self.guild_configs.update_leveling(ctx.guild.id, {"curve": curve})
+            curve = curve if curve is not None else state.curve
+
+            await self.accumulator.flush()
+            members = await self.database.get_member_xp(ctx.guild.id)
+            levels = await loop.run_in_executor(None, leveling_math.bulk_levels, [xp for _, xp in members], curve)
+            await self.database.set_member_levels(ctx.guild.id, {user_id: level for (user_id, _), level
+                                                                 in zip(members, levels)})
+            self.accumulator.forget(ctx.guild.id)
+
+        await ctx.send(f"Alright, recalculated the levels of {len(members):,} members with a curve of {curve}")
+
     @commands.command(name="enable_leveling", aliases=["EnableLeveling"])
     @commands.has_permissions(manage_guild=True)
     async def enable_leveling_command(self, ctx):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if config.leveling_enabled:
             return await ctx.send("This server already has leveling enabled")
 
-        self.guilds.update_one({"_id": ctx.guild.id}, {"data.member.leveling_enabled", True})
+        await self.guild_configs.update(ctx.guild.id, {"data.member.leveling_enabled": True})
         await ctx.send("Alright, leveling has been enabled")
 
     @commands.command(name="disable_leveling", aliases=["DisableLeveling"])
     @commands.has_permissions(manage_guild=True)
     async def disable_leveling_command(self, ctx):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("This server does not have leveling enabled")
 
-        self.guilds.update_one({"_id": ctx.guild.id}, {"data.member.leveling_enabled", False})
+        await self.guild_configs.update(ctx.guild.id, {"data.member.leveling_enabled": False})
         await ctx.send("Alright, leveling has been disabled")
 
     @commands.command(name="enable_xp_randomizer", aliases=["EnableXPRandomizer"])
     @commands.has_permissions(manage_guild=True)
-    async def enable_leveling_command(self, ctx):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+    async def enable_xp_randomizer_command(self, ctx):
+        if not (config := ctx.snapshot.guild):
             return
-        if not self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("This server does not have leveling enabled")
-        if self.leveling.find_one(ctx.guild.id)['randomized']:
+        if not (state := ctx.snapshot.leveling):
+            return
+        if state.randomized:
             return await ctx.send("This server already has random XP gain")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"randomized", True})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"randomized": True})
         await ctx.send("Alright, random XP gain has been enabled")
 
     @commands.command(name="disable_xp_randomizer", aliases=["DisableXPRandomizer"])
     @commands.has_permissions(manage_guild=True)
-    async def disable_leveling_command(self, ctx):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+    async def disable_xp_randomizer_command(self, ctx):
+        if not (config := ctx.snapshot.guild):
             return
-        if not self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("This server does not have leveling enabled")
-        if not self.leveling.find_one(ctx.guild.id)['randomized']:
+        if not (state := ctx.snapshot.leveling):
+            return
+        if not state.randomized:
             return await ctx.send("This server does not have random XP gain")
 
-        self.leveling.update_one({"_id": ctx.guild.id}, {"randomized", False})
+        await self.guild_configs.update_leveling(ctx.guild.id, {"randomized": False})
         await ctx.send("Alright, random XP gain has been disabled")
 
     @commands.command(name="level", description="Displays a user's level")
     async def level_command(self, ctx, target: t.Optional[discord.Member]):
-        if not (result := self.leveling.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not self.guilds.find_one(ctx.guild.id)["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("This server does not have leveling enabled")
+        if not (state := ctx.snapshot.leveling):
+            return
 
         target = target or ctx.author
-        if not (member := self.leveling.find_one(ctx.guild.id)["members"][str(target.id)]):
+        if not (member := await self.get_member(ctx, target)):
             return await ctx.send("It seems that user isn't logged yet")
 
-        xp = member["xp"]
-        lvl = member["level"]
-        lock_time = dt.datetime.strptime(member["lock_time"], "%Y-%m-%dT%H:%M:%SZ")
-
-        if lock_time > dt.datetime.now():
-            current_date = dt.datetime.now()
-            time_until = lock_time - current_date
-            locked = f"User is xp locked until {time_until}"
+        current = self.accumulator.current(ctx.guild.id, target.id, member)
+        xp = current["xp"]
+        lvl = current["level"]
+        if lock_time := self.locks.locked_until(ctx.guild.id, target.id):
+            time_until = lock_time - dt.datetime.now(dt.timezone.utc)
+            locked = f"User is xp locked for {util.timedelta_to_string(time_until)}"
         else:
             locked = f"{target.mention} is not xp locked"
 
+        to_next = leveling_math.xp_to_next_level(xp, state.curve)
+        progress = leveling_math.progress_percent(xp, state.curve)
         embed = discord.Embed(title=f"{target.display_name}'s level",
-                              description=f"XP: {xp}\nLevel: {lvl}\n{locked}",
+                              description=f"XP: {xp}\nLevel: {lvl}\n"
+                                          f"{to_next:,.0f} XP to level {lvl + 1} ({progress:.1f}%)\n{locked}",
                               color=self.bot.COLOR, timestamp=dt.datetime.now())
 
         embed.set_footer(text=f"Leveling system developed by {self.bot.OWNER_USERNAME}")
         embed.set_author(name=ctx.author.display_name)
         await ctx.send(embed=embed)
 
+    @commands.command(name="leaderboard", aliases=["lb", "top"], description="Shows the server's XP leaderboard")
+    async def leaderboard_command(self, ctx):
+        if not (config := ctx.snapshot.guild):
+            return
+        if not config.leveling_enabled:
+            return await ctx.send("This server does not have leveling enabled")
+
+        board = await self.ranks.get(ctx.guild.id, self.accumulator.members_of(ctx.guild.id))
+        if not len(board):
+            return await ctx.send("Nobody on this server has earned any XP yet")
+
+        menu = MenuPages(source=LeaderboardMenu(ctx, board, self.bot), delete_message_after=True, timeout=60.0)
+        await menu.start(ctx)
+
+    @commands.command(name="rank", description="Shows where a user ranks on the server's XP leaderboard")
+    async def rank_command(self, ctx, target: t.Optional[discord.Member]):
+        if not (config := ctx.snapshot.guild):
+            return
+        if not config.leveling_enabled:
+            return await ctx.send("This server does not have leveling enabled")
+
+        target = target or ctx.author
+        board = await self.ranks.get(ctx.guild.id, self.accumulator.members_of(ctx.guild.id))
+        if not (rank := board.rank(target.id)):
+            return await ctx.send(f"{target.mention} isn't ranked yet")
+
+        xp = board.page(rank - 1, 1)[0][2]
+        await ctx.send(f"{target.mention} is ranked **{util.ordinal_suffix(rank)}** "
+                       f"of {len(board):,} with {xp:,.0f} XP")
+
     @commands.command(name="xp_lock", description="Lets moderators prevent users from gaining xp")
     @commands.has_permissions(manage_roles=True)
     async def lock_xp_command(self, ctx, target: discord.Member, duration: t.Optional[str], *,
@@ -365,32 +481,30 @@ class Leveling(commands.Cog):
             return await ctx.send("You can't XP Lock yourself")
 
         if not duration:
-            if not (result := self.guilds.find_one(ctx.guild.id)):
+            if not (config := ctx.snapshot.guild):
                 return
-            if not result["data"]["member"]["leveling_enabled"]:
+            if not config.leveling_enabled:
                 return await ctx.send("Leveling is not enabled on this server")
             if target.bot:
                 return await ctx.send("Bots aren't logged in the database")
-            if str(target.id) not in (members := self.leveling.find_one(ctx.guild.id)["members"]).keys():
+            if not (member := await self.get_member(ctx, target)):
                 return await ctx.send(f"{target.mention} isn't in the database")
 
-            member = members[str(target.id)]
-            lock_time = dt.datetime.strptime(member["lock_time"], "%Y-%m-%dT%H:%M:%SZ")
-            if lock_time < dt.datetime.now():
+            if not (lock_time := self.locks.locked_until(ctx.guild.id, target.id)):
                 return await ctx.send(f"{target.mention} isn't xp locked")
-            lock_delta = lock_time - dt.datetime.now(pytz.utc)
+            lock_delta = lock_time - dt.datetime.now(dt.timezone.utc)
 
             return await ctx.send(f"{target.mention} is xp locked "
                                   f"and still has {util.timedelta_to_string(lock_delta)} to go")
 
         # command caller specified a duration
-        unlock_datetime = util.time_string_to_datetime(duration)
-        unlock_db_time = unlock_datetime.strftime("%Y-%m-%dT%H:%M:%SZ")
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {f"members.{str(target.id)}.lock_time": unlock_db_time}})
-        times_locked = self.leveling.find_one(ctx.guild.id)["members"][str(target.id)]["times_locked"]
-        times_locked += 1
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {f"members.{str(target.id)}.times_locked": times_locked}})
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {f"members.{str(target.id)}.lock_reason": reason}})
+        if not (member := await self.get_member(ctx, target)):
+            return await ctx.send(f"{target.mention} isn't in the database")
+        unlock_datetime = dt.datetime.now(dt.timezone.utc) + util.time_string_to_timedelta(duration)
+        await self.database.update_member(ctx.guild.id, target.id, {"lock_time": unlock_datetime,
+                                                                    "times_locked": member["times_locked"] + 1,
+                                                                    "lock_reason": reason})
+        self.locks.lock(ctx.guild.id, target.id, unlock_datetime)
 
         await ctx.send(f"Alright, {target.mention} has been xp locked until "
                        f"{unlock_datetime.strftime('%Y-%m-%d at %H:%M:%S')}")
@@ -398,21 +512,19 @@ class Leveling(commands.Cog):
     @commands.command(name="xp_unlock")
     @commands.has_permissions(manage_roles=True)
     async def xp_unlock_command(self, ctx, target: discord.Member):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := ctx.snapshot.guild):
             return
-        if not result["data"]["member"]["leveling_enabled"]:
+        if not config.leveling_enabled:
             return await ctx.send("Leveling is not enabled on this server")
         if target.bot:
             return await ctx.send("Bots aren't logged in the database")
-        if (t_id := str(target.id)) not in (members := self.leveling.find_one(ctx.guild.id)["members"]).keys():
+        if not await self.get_member(ctx, target):
             return await ctx.send(f"{target.mention} isn't in the database")
-        lock_time_offset_naive = dt.datetime.strptime(members[t_id]["lock_time"], "%Y-%m-%dT%H:%M:%SZ")
-        lock_time_offset_aware = lock_time_offset_naive.replace(tzinfo=pytz.utc)
-        if dt.datetime.now(pytz.utc) > lock_time_offset_aware:
+        if not self.locks.is_locked(ctx.guild.id, target.id):
             return await ctx.send(f"{target.mention} is not xp locked!")
 
-        format_now = dt.datetime.now(pytz.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-        self.leveling.update_one({"_id": ctx.guild.id}, {"$set": {f"members.{t_id}.lock_time": format_now}})
+        await self.database.update_member(ctx.guild.id, target.id, {"lock_time": dt.datetime.now(dt.timezone.utc)})
+        self.locks.unlock(ctx.guild.id, target.id)
 
         await ctx.send(f"Alright, {target.mention} is no longer xp locked")
 
@@ -1,7 +1,6 @@
-import io
-import json
+import asyncio
 import datetime as dt
-import os
+import logging
 import typing as t
 
 from dateutil.relativedelta import relativedelta
@@ -11,23 +10,37 @@ import discord.flags
 from discord.ext import commands
 
 import util
+from util import archive
+from util.permissions import ADMINISTRATOR, permission_block, permission_count
+
+log = logging.getLogger(__name__)
 
 
 class Logger(commands.Cog):
     """Handles logging events and commands"""
+    # Purges with more message text than this are archived gzip compressed
+    PURGE_GZIP_FROM = 256 * 1024
+
     def __init__(self, bot):
         self.bot = bot
-        self.guilds = self.bot.MONGO_DB["Guilds"]
-        self.leveling = self.bot.MONGO_DB["Leveling"]
+        self.guild_configs = self.bot.GUILD_CONFIGS
+        self.delivery = self.bot.LOG_DELIVERY
+        self.webhooks = self.bot.LOG_WEBHOOKS
+        self.messages = self.bot.MESSAGE_STORE
+
+    async def log_destination(self, config, channel_id) -> t.Optional[discord.abc.Messageable]:
+        if config.log.get("use_webhooks"):
+            return await self.webhooks.get(config, int(channel_id))
+        return self.bot.get_channel(int(channel_id))
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        if not (result := self.guilds.find_one(member.guild.id)):
+        if not (config := await self.guild_configs.get(member.guild.id)):
             return
-        if not (member_joined_channel_id := result["data"]["log"]["member_joined_channel"]):
+        if not (member_joined_channel_id := config.log["member_joined_channel"]):
             return
 
-        member_joined_channel = self.bot.get_channel(int(member_joined_channel_id))
+        member_joined_channel = await self.log_destination(config, member_joined_channel_id)
 
         now = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         now = dt.datetime.strptime(now, "%Y-%m-%d %H:%M:%S")
@@ -40,7 +53,7 @@ class Logger(commands.Cog):
         months = diff.months
         days = diff.days
 
-        if td.days >= result["data"]["log"]["new_account_age"]:
+        if td.days >= config.log["new_account_age"]:
             msg = f"This account is {years} years, {months} months, {days} days old"
         else:
             seconds = td.total_seconds()
@@ -55,16 +68,16 @@ class Logger(commands.Cog):
         embed.set_footer(icon_url=self.bot.user.avatar.url, text=f"Logging developed by {self.bot.OWNER_USERNAME}")
         embed.set_author(name=f"{member.name}", icon_url=member.guild.icon.url)
         embed.set_thumbnail(url=member.avatar.url)
-        await member_joined_channel.send(embed=embed)
+        await self.delivery.send(member_joined_channel, embed)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
-        if not (result := self.guilds.find_one(member.guild.id)):
+        if not (config := await self.guild_configs.get(member.guild.id)):
             return
-        if not (member_leave_channel_id := result["data"]["log"]["member_left_channel"]):
+        if not (member_leave_channel_id := config.log["member_left_channel"]):
             return
 
-        member_leave_channel = self.bot.get_channel(int(member_leave_channel_id))
+        member_leave_channel = await self.log_destination(config, member_leave_channel_id)
 
         now = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
         now = dt.datetime.strptime(now, "%Y-%m-%d %H:%M:%S")
@@ -77,7 +90,7 @@ class Logger(commands.Cog):
         months = diff.months
         days = diff.days
 
-        if td.days >= result["data"]["log"]["new_account_age"]:
+        if td.days >= config.log["new_account_age"]:
             msg = f"This account joined {years} years, {months} months, {days} days ago"
         else:
             seconds = td.total_seconds()
@@ -93,184 +106,238 @@ class Logger(commands.Cog):
         embed.set_footer(icon_url=self.bot.user.avatar.url, text=f"Logging developed by {self.bot.OWNER_USERNAME}")
         embed.set_author(name=f"{member.name}", icon_url=member.guild.icon.url)
         embed.set_thumbnail(url=member.avatar.url)
-        await member_leave_channel.send(embed=embed)
+        await self.delivery.send(member_leave_channel, embed)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
         if before.content == after.content:
             return
-        if not (result := self.guilds.find_one(before.guild.id)):
+        if not (config := await self.guild_configs.get(before.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (edited_message_channel_id := logs["edited_message_channel"]):
             return
-        edited_message_channel = self.bot.get_channel(int(edited_message_channel_id))
-
-        embed = discord.Embed(
-            title="Message Edited",
-            color=self.bot.COLOR,
-            timestamp=dt.datetime.utcnow()
-        )
-        embed.add_field(name="**Member:**", value=after.author.mention, inline=False)
-        embed.add_field(name="**Original:**", value=f"`{before.content}`", inline=True)
-        embed.add_field(name="**Current:**", value=f"`{after.content}`", inline=True)
-        embed.add_field(name="**Channel:**", value=before.channel.mention, inline=False)
-        embed.add_field(name="**Message ID:**", value=before.id, inline=False)
-        embed.set_footer(text=f"ID: {before.author.id}")
-        embed.set_thumbnail(url=before.author.avatar.url)
+        edited_message_channel = await self.log_destination(config, edited_message_channel_id)
 
-        await edited_message_channel.send(embed=embed)
+        embed = self.message_edited_embed(before.author.id, before.content, after.content, before.channel.id,
+                                          before.id, before.author.avatar.url)
+        await self.delivery.send(edited_message_channel, embed)
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         if not message.content:
             return
-        if not (result := self.guilds.find_one(message.guild.id)):
+        if not (config := await self.guild_configs.get(message.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (deleted_message_channel_id := logs["deleted_message_channel"]):
             return
-        deleted_message_channel = self.bot.get_channel(int(deleted_message_channel_id))
+        deleted_message_channel = await self.log_destination(config, deleted_message_channel_id)
 
+        embed = self.message_deleted_embed(message.author.id, message.content, message.channel.id, message.id,
+                                           message.author.avatar.url)
+        await self.delivery.send(deleted_message_channel, embed)
+
+    def message_edited_embed(self, author_id: int, before: str, after: str, channel_id: int, message_id: int,
+                             avatar_url: t.Optional[str]) -> discord.Embed:
+        embed = discord.Embed(
+            title="Message Edited",
+            color=self.bot.COLOR,
+            timestamp=dt.datetime.utcnow()
+        )
+        embed.add_field(name="**Member:**", value=f"<@{author_id}>", inline=False)
+        embed.add_field(name="**Original:**", value=f"`{before}`", inline=True)
+        embed.add_field(name="**Current:**", value=f"`{after}`", inline=True)
+        embed.add_field(name="**Channel:**", value=f"<#{channel_id}>", inline=False)
+        embed.add_field(name="**Message ID:**", value=message_id, inline=False)
+        embed.set_footer(text=f"ID: {author_id}")
+        if avatar_url:
+            embed.set_thumbnail(url=avatar_url)
+        return embed
+
+    def message_deleted_embed(self, author_id: int, content: str, channel_id: int, message_id: int,
+                              avatar_url: t.Optional[str]) -> discord.Embed:
         embed = discord.Embed(
             title="Message Deleted",
             color=self.bot.COLOR,
             timestamp=dt.datetime.utcnow()
         )
-        embed.add_field(name="**Member:**", value=message.author.mention, inline=False)
-        embed.add_field(name="**Message:**", value=f"`{message.content}`", inline=True)
-        embed.add_field(name="**Channel:**", value=message.channel.mention, inline=True)
-        embed.add_field(name="**Message ID:**", value=message.id, inline=False)
-        embed.set_footer(text=f"ID: {message.author.id}")
-        embed.set_thumbnail(url=message.author.avatar.url)
+        embed.add_field(name="**Member:**", value=f"<@{author_id}>", inline=False)
+        embed.add_field(name="**Message:**", value=f"`{content}`", inline=True)
+        embed.add_field(name="**Channel:**", value=f"<#{channel_id}>", inline=True)
+        embed.add_field(name="**Message ID:**", value=message_id, inline=False)
+        embed.set_footer(text=f"ID: {author_id}")
+        if avatar_url:
+            embed.set_thumbnail(url=avatar_url)
+        return embed
+
+    def avatar_url(self, user_id: t.Optional[int]) -> t.Optional[str]:
+        if user_id and (user := self.bot.get_user(int(user_id))):
+            return user.display_avatar.url
+        return None
 
-        await deleted_message_channel.send(embed=embed)
+    @commands.Cog.listener()
+    async def on_message_snapshot(self, msg: discord.Message, snapshot):
+        # Only guilds that log deletes or edits pay for keeping message content
+        if not msg.guild or not (config := snapshot.guild):
+            return
+        if config.log["deleted_message_channel"] or config.log["edited_message_channel"]:
+            self.messages.add(msg.guild.id, msg.id, msg.channel.id, msg.author.id, msg.content)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if not payload.guild_id:
+            return
+        record = self.messages.pop(payload.guild_id, payload.message_id)
+        # Messages still in discord.py's cache are logged by on_message_delete
+        if payload.cached_message is not None or not record:
+            return
+        if not (config := await self.guild_configs.get(payload.guild_id)):
+            return
+        if not (deleted_message_channel_id := config.log["deleted_message_channel"]):
+            return
+        deleted_message_channel = await self.log_destination(config, deleted_message_channel_id)
+
+        embed = self.message_deleted_embed(record.author_id, record.content, record.channel_id, record.id,
+                                           self.avatar_url(record.author_id))
+        await self.delivery.send(deleted_message_channel, embed)
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        if not payload.guild_id or "content" not in payload.data:
+            return
+        after = payload.data["content"]
+        before = self.messages.edit(payload.guild_id, payload.message_id, after)
+        # Messages still in discord.py's cache are logged by on_message_edit
+        if payload.cached_message is not None or before is None or before == after:
+            return
+        if not (config := await self.guild_configs.get(payload.guild_id)):
+            return
+        if not (edited_message_channel_id := config.log["edited_message_channel"]):
+            return
+        edited_message_channel = await self.log_destination(config, edited_message_channel_id)
+
+        author_id = int(payload.data.get("author", {}).get("id", 0))
+        embed = self.message_edited_embed(author_id, before, after, payload.channel_id, payload.message_id,
+                                          self.avatar_url(author_id))
+        await self.delivery.send(edited_message_channel, embed)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id:
+            for message_id in payload.message_ids:
+                self.messages.pop(payload.guild_id, message_id)
 
     @commands.Cog.listener()
     async def on_bulk_message_delete(self, messages: list[discord.Message]):
         guild: discord.Guild = messages[0].guild
-        if not (result := self.guilds.find_one(guild.id)):
+        if not (config := await self.guild_configs.get(guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (deleted_message_channel_id := logs["deleted_message_channel"]):
             return
-        deleted_message_channel = self.bot.get_channel(int(deleted_message_channel_id))
+        if not (deleted_message_channel := await self.log_destination(config, deleted_message_channel_id)):
+            return
 
         message_count = len(messages)
-        with open(f"purge.json", "w+") as j:
-            data = dict()
-            for message in messages:
-                author: discord.User = message.author
-                entree = {
-                    message.id: {
-                        "Username": f"{author.name}",
-                        "ID": author.id,
-                        "Message": message.content,
-                        "Attachments": [attachment.url for attachment in message.attachments]
-                    }
-                }
-                data.update(entree)
-            text_data = json.dumps(data, indent=4)
-            bytes_data = io.BytesIO(text_data.encode("utf-8"))
+        records = [{
+            "MessageID": message.id,
+            "Username": f"{message.author.name}",
+            "ID": message.author.id,
+            "Message": message.content,
+            "Attachments": [attachment.url for attachment in message.attachments]
+        } for message in messages]
+        compress = sum(len(message.content) for message in messages) > self.PURGE_GZIP_FROM
+        parts = await asyncio.get_running_loop().run_in_executor(
+            None, archive.build_ndjson_parts, records, guild.filesize_limit, compress)
 
         embed = discord.Embed(
             title=f"{message_count} messages purged in {messages[0].channel.mention}",
             color=self.bot.COLOR,
             timestamp=dt.datetime.utcnow()
         )
-        await deleted_message_channel.send(embed=embed, file=discord.File(fp=bytes_data, filename="purge.json"))
-        os.remove("purge.json")
-
-    def permission_string_from_list(self, perms: list[str]) -> str:
-        ret = ""
-        perm_dict = dict()
-        for perm in util.PERMISSION_DICT.keys():
-            perm_dict[perm] = util.PERMISSION_DICT[perm] if perm in perms else None
-        i = 0
-        ret += "```"
-        for k, v in perm_dict.items():
-            if not v:
-                continue
-            i += 1
-            ret += f"{k} - "
-            if (i % 2) == 0:
-                ret = ret[:-2]
-                ret += "\n"
-        ret += "```"
-        return ret
-
-    def permission_string(self, role: discord.Role) -> (str, list[str]):
-        enabled_permissions = [perm.replace("_", " ").title() for perm, value in role.permissions if value]
-        return self.permission_string_from_list(enabled_permissions), enabled_permissions
+        extension = "ndjson.gz" if compress else "ndjson"
+        try:
+            if len(parts) == 1:
+                filename = f"purge-{messages[0].channel.id}.{extension}"
+                return await deleted_message_channel.send(embed=embed,
+                                                          file=discord.File(fp=parts[0], filename=filename))
+            # Over the upload limit, every part goes in its own message
+            for number, part in enumerate(parts, start=1):
+                filename = f"purge-{messages[0].channel.id}-{number}.{extension}"
+                await deleted_message_channel.send(content=f"Part {number} of {len(parts)}",
+                                                   embed=embed if number == 1 else None,
+                                                   file=discord.File(fp=part, filename=filename))
+        except discord.HTTPException as exc:
+            log.warning(f"Uploading the purge log for {messages[0].channel.id} failed: {exc!r}",
+                        extra={"guild": guild.id, "channel": deleted_message_channel.id, "status": exc.status})
 
     @commands.Cog.listener()
     async def on_guild_role_create(self, role: discord.Role):
-        if not (result := self.guilds.find_one(role.guild.id)):
+        if not (config := await self.guild_configs.get(role.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (role_create_channel_id := logs["role_create_channel"]):
             return
-        role_create_channel = self.bot.get_channel(int(role_create_channel_id))
+        role_create_channel = await self.log_destination(config, role_create_channel_id)
 
-        enabled_permissions = [perm.replace("_", " ").title() for perm, value in role.permissions if value]
+        permissions = role.permissions.value
         embed = discord.Embed(title="Role created",
                               description=f"**Name**: {role.mention}\n"
                                           f"**ID**: {role.id}\n**Color**: {hex(role.color.value)}\n"
                                           f"**Position**: {role.position}\n"
-                                          f"**{len(enabled_permissions)} Permissions**:\n```",
+                                          f"**{permission_count(permissions)} Permissions**:\n",
                               color=role.color,
                               timestamp=dt.datetime.now())
         embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
         embed.set_author(name="Role creation event", icon_url=role.guild.icon.url)
 
-        embed.description += self.permission_string(role)
+        embed.description += permission_block(permissions)
 
-        if "Administrator" in enabled_permissions:
+        if permissions & ADMINISTRATOR:
             warning = "⚠**!WARNING!**⚠\nADMINISTRATOR IS ENABLED FOR THIS ROLE\n\n"
             warning += embed.description
             embed.description = warning
-        await role_create_channel.send(embed=embed)
+        await self.delivery.send(role_create_channel, embed)
 
     @commands.Cog.listener()
     async def on_guild_role_delete(self, role: discord.Role):
-        if not (result := self.guilds.find_one(role.guild.id)):
+        if not (config := await self.guild_configs.get(role.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (role_delete_channel_id := logs["role_delete_channel"]):
             return
-        role_delete_channel = self.bot.get_channel(int(role_delete_channel_id))
+        role_delete_channel = await self.log_destination(config, role_delete_channel_id)
 
-        enabled_permissions = [perm.replace("_", " ").title() for perm, value in role.permissions if value]
+        permissions = role.permissions.value
         embed = discord.Embed(title="Role deleted",
                               description=f"**Name**: {role.name}\n"
                                           f"**ID**: {role.id}\n**Color**: {hex(role.color.value)}\n"
                                           f"**Position**: {role.position}\n"
-                                          f"**{len(enabled_permissions)} Permissions**:\n```",
+                                          f"**{permission_count(permissions)} Permissions**:\n",
                               color=role.color,
                               timestamp=dt.datetime.now())
         embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
         embed.set_author(name="Role deletion event", icon_url=role.guild.icon.url)
 
-        embed.description += self.permission_string(role)
+        embed.description += permission_block(permissions)
 
-        await role_delete_channel.send(embed=embed)
+        await self.delivery.send(role_delete_channel, embed)
 
     @commands.Cog.listener()
     async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
-        if not (result := self.guilds.find_one(before.guild.id)):
+        if not (config := await self.guild_configs.get(before.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (role_edited_channel_id := logs["role_edited_channel"]):
             return
-        role_edited_channel = self.bot.get_channel(int(role_edited_channel_id))
-        before_permission_string, before_permissions = self.permission_string(before)
-        after_permission_string, after_permissions = self.permission_string(after)
+        role_edited_channel = await self.log_destination(config, role_edited_channel_id)
 
         description = ""
         if after.name != before.name:
@@ -288,12 +355,12 @@ class Logger(commands.Cog):
         else:
             description += f"\n**Position**: {after.position}\n"
 
-        if not (changed_perms := list(set(after_permissions) ^ set(before_permissions))):
+        if not (changed := before.permissions.value ^ after.permissions.value):
             description += f"No permissions changed"
         else:
-            description += (f"**{len(changed_perms)} Permissions changed:**\n"
-                            f"{self.permission_string_from_list(changed_perms)}")
-            if "Administrator" in changed_perms:
+            description += (f"**{permission_count(changed)} Permissions changed:**\n"
+                            f"{permission_block(changed)}")
+            if changed & after.permissions.value & ADMINISTRATOR:
                 warning = "⚠**!WARNING!**⚠\nADMINISTRATOR IS ENABLED FOR THIS ROLE\n\n"
                 warning += description
                 description = warning
@@ -302,7 +369,7 @@ class Logger(commands.Cog):
                               color=after.color, timestamp=dt.datetime.now())
         embed.set_author(name="Role changed event", icon_url=after.guild.icon.url)
         embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
-        await role_edited_channel.send(embed=embed)
+        await self.delivery.send(role_edited_channel, embed)
 
     @commands.Cog.listener()
     async def on_user_update(self, before, after):
@@ -310,13 +377,13 @@ class Logger(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
-        if not (result := self.guilds.find_one(before.guild.id)):
+        if not (config := await self.guild_configs.get(before.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (member_update_channel_id := logs["member_update_channel"]):
             return
-        member_update_channel = self.bot.get_channel(int(member_update_channel_id))
+        member_update_channel = await self.log_destination(config, member_update_channel_id)
 
         title = ""
         embed = discord.Embed(color=self.bot.COLOR, timestamp=dt.datetime.now())
@@ -353,17 +420,17 @@ class Logger(commands.Cog):
             embed.title = title
             embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
             embed.set_author(name="User update event!", icon_url=before.guild.icon.url)
-            await member_update_channel.send(embed=embed)
+            await self.delivery.send(member_update_channel, embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
-        if not (result := self.guilds.find_one(channel.guild.id)):
+        if not (config := await self.guild_configs.get(channel.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (channel_create_channel_id := logs["channel_create_channel"]):
             return
-        channel_create_channel = self.bot.get_channel(int(channel_create_channel_id))
+        channel_create_channel = await self.log_destination(config, channel_create_channel_id)
         embed = discord.Embed(title="Channel created!",
                               description=f"A new channel has been created: {channel.mention}\n"
                                           f"Name: {channel.name}\n"
@@ -372,17 +439,17 @@ class Logger(commands.Cog):
                                           f"Type: {str(channel.type).title()}")
         embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
         embed.set_author(name=f"Channel creation event in {channel.guild.name}", icon_url=channel.guild.icon.url)
-        await channel_create_channel.send(embed=embed)
+        await self.delivery.send(channel_create_channel, embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
-        if not (result := self.guilds.find_one(channel.guild.id)):
+        if not (config := await self.guild_configs.get(channel.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (channel_delete_channel_id := logs["channel_delete_channel"]):
             return
-        channel_delete_channel = self.bot.get_channel(int(channel_delete_channel_id))
+        channel_delete_channel = await self.log_destination(config, channel_delete_channel_id)
         embed = discord.Embed(title="Channel deleted!",
                               description=f"A channel has been deleted!\n"
                                           f"Name: {channel.name}\n"
@@ -391,17 +458,17 @@ class Logger(commands.Cog):
                                           f"Type: {str(channel.type).title()}")
         embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
         embed.set_author(name=f"Channel deletion event in {channel.guild.name}", icon_url=channel.guild.icon.url)
-        await channel_delete_channel.send(embed=embed)
+        await self.delivery.send(channel_delete_channel, embed)
 
     @commands.Cog.listener()
     async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
-        if not (result := self.guilds.find_one(before.guild.id)):
+        if not (config := await self.guild_configs.get(before.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (channel_update_channel_id := logs["channel_update_channel"]):
             return
-        channel_update_channel = self.bot.get_channel(int(channel_update_channel_id))
+        channel_update_channel = await self.log_destination(config, channel_update_channel_id)
 
         title = ""
         embed = discord.Embed(color=self.bot.COLOR, timestamp=dt.datetime.now())
@@ -432,18 +499,18 @@ class Logger(commands.Cog):
             embed.title = title
             embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
             embed.set_author(name=f"Channel deletion event in {before.guild.name}", icon_url=before.guild.icon.url)
-            await channel_update_channel.send(embed=embed)
+            await self.delivery.send(channel_update_channel, embed)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState,
                                     after: discord.VoiceState):
-        if not (result := self.guilds.find_one(member.guild.id)):
+        if not (config := await self.guild_configs.get(member.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if not (voice_update_channel_id := logs["voice_update_channel"]):
             return
-        voice_update_channel = self.bot.get_channel(int(voice_update_channel_id))
+        voice_update_channel = await self.log_destination(config, voice_update_channel_id)
         description = ""
         if before.channel is None and after.channel is not None:
             description = f"{member.mention} ({member.id}) has joined {after.channel.mention}."
@@ -463,31 +530,31 @@ class Logger(commands.Cog):
             embed.set_footer(text=f"Logging developed by {self.bot.OWNER_USERNAME}", icon_url=self.bot.user.avatar.url)
             guild = (before.channel or after.channel).guild
             embed.set_author(name=f"Channel deletion event in {guild.name}", icon_url=guild.icon.url)
-            await voice_update_channel.send(embed=embed)
+            await self.delivery.send(voice_update_channel, embed)
 
     async def log_channel_update(self, ctx: commands.Context, log_channel_entry: str, channel: t.Optional[discord.TextChannel]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := await self.guild_configs.get(ctx.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if (log_channel_id := logs[log_channel_entry]) and not channel:
             log_channel: discord.TextChannel = self.bot.get_channel(int(log_channel_id))
             return await ctx.send(f"This server's current {util.LOG_NAME_DICT[log_channel_entry]} is {log_channel.mention}")
         if not (log_channel_id or channel):
             return await ctx.send(f"This server does not have a {util.LOG_NAME_DICT[log_channel_entry]}")
-        self.guilds.update_one({"_id": ctx.guild.id}, {"$set": {f"data.log.{log_channel_entry}": str(channel.id)}})
+        await self.guild_configs.update(ctx.guild.id, {f"data.log.{log_channel_entry}": str(channel.id)})
         await ctx.send(f"Alright, the server's new {util.LOG_NAME_DICT[log_channel_entry]} is {channel.mention}")
 
     async def log_integer_update(self, ctx: commands.Context, log_entry: str, age: t.Optional[int]):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+        if not (config := await self.guild_configs.get(ctx.guild.id)):
             return
-        if not (logs := result["data"]["log"]):
+        if not (logs := config.log):
             return
         if (curr_age := logs[log_entry]) and not age:
             return await ctx.send(f"This server's current {util.LOG_NAME_DICT[log_entry]} is {curr_age}")
         if not (curr_age or age):
             return await ctx.send(f"This server does not have a {util.LOG_NAME_DICT[log_entry]}")
-        self.guilds.update_one({"_id": ctx.guild.id}, {"$set": {f"data.log.{log_entry}": age}})
+        await self.guild_configs.update(ctx.guild.id, {f"data.log.{log_entry}": age})
         await ctx.send(f"Alright, the server's new {util.LOG_NAME_DICT[log_entry]} is {age}")
 
     @commands.group(name="logs", description="Command group for all the log channels")
@@ -496,6 +563,19 @@ class Logger(commands.Cog):
         if not ctx.invoked_subcommand:
             await ctx.reply("Please specify a subcommand!")
 
+    @log_group.command(name="webhooks", description="Sends logs through webhooks (on) or as the bot (off)")
+    async def log_webhooks_command(self, ctx, state: t.Optional[str]):
+        if not (config := await self.guild_configs.get(ctx.guild.id)):
+            return
+        if state not in ("on", "off"):
+            current = "on" if config.log.get("use_webhooks") else "off"
+            return await ctx.send(f"Webhook log delivery is {current} for this server. Use `on` or `off` to change it")
+        await self.guild_configs.update(ctx.guild.id, {"data.log.use_webhooks": state == "on"})
+        if state == "on":
+            return await ctx.send("Alright, logs will be sent through webhooks. "
+                                  "I need the Manage Webhooks permission in each log channel for this")
+        await ctx.send("Alright, logs will be sent by the bot")
+
     @log_group.group(name="member", description="Command group for all member log channels")
     async def log_member_group(self, ctx):
         if not ctx.invoked_subcommand:
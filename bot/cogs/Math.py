@@ -2,20 +2,22 @@ import datetime as dt
 import math as m
 import typing as t
 import base64
-import scipy
-
-import pymep.realParser
-from pymep.realParser import parse
-from pymep.realParser import eval
 
 import discord
 from discord.ext import commands
 
+import util
+
 
 class Math(commands.Cog):
     """Pretty much a fancy calculator on the bot :)"""
     def __init__(self, bot):
         self.bot = bot
+        self._imports = None
+
+    async def cog_load(self):
+        # scipy takes longer to import than the rest of the bot, it and pymep load in the background instead
+        self._imports = util.import_in_background("pymep.realParser", "scipy.special")
 
     @commands.command(name="hex", description="Translates an RGB value (0 to 255) to a hexadecimal value.")
     async def rgb_to_hex_command(self, ctx: commands.Context, red: int, green: int, blue: int):
@@ -110,18 +112,22 @@ class Math(commands.Cog):
 
     @commands.command(name="parse", description="A basic parser for arithmetic expressions.")
     async def parse_expression(self, ctx, *, expression: str):
+        await self._imports
+        from pymep import realParser
         try:
-            result = parse(expression)
-        except pymep.realParser.CalculatorException:
+            result = realParser.parse(expression)
+        except realParser.CalculatorException:
             return await ctx.send("I could not evaluate that expression! Did you send invalid syntax?")
         await ctx.send(f"`{expression}` = {result:10.4f}")
         
     @commands.command(name="eval", description="A basic evaluation statement for arithmetic expressions."
                                                " Usage: `M!eval x 2 x^2`")
     async def evaluate_equation(self, ctx, var, val, *, equation):
+        await self._imports
+        from pymep import realParser
         try:
-            result = eval(f" {equation}", {var: val})
-        except pymep.realParser.CalculatorException:
+            result = realParser.eval(f" {equation}", {var: val})
+        except realParser.CalculatorException:
             return await ctx.send("I could not evaluate that expression! Did you send invalid syntax?")
         await ctx.send(f"`{equation}` where {var} is {val} = {result:.4f}")
 
@@ -219,7 +225,9 @@ class Math(commands.Cog):
 
     @commands.command(name="factorial", description="Returns the factorial of any real number")
     async def factorial_command(self, ctx, n):
-        await ctx.send(f"{n}! = {scipy.special.gamma(float(n) + 1)}")
+        await self._imports
+        from scipy import special
+        await ctx.send(f"{n}! = {special.gamma(float(n) + 1)}")
 
 
 async def setup(bot):
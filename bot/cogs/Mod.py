@@ -12,7 +12,7 @@ class Mod(commands.Cog):
     """Handles moderation commands and lets people abuse their power."""
     def __init__(self, bot):
         self.bot = bot
-        self.guilds = self.bot.MONGO_DB["Guilds"]
+        self.guild_configs = self.bot.GUILD_CONFIGS
 
     async def timeout_user(self, user, guild, time):
         headers = {"Authorization", f"Bot: {self.bot.http.token}"}
@@ -70,9 +70,9 @@ class Mod(commands.Cog):
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, user: discord.User, reason: t.Optional[str],
                             moderator: t.Optional[discord.Member]):
-        if not (result := self.guilds.find_one(guild.id)):
+        if not (config := await self.guild_configs.get(guild.id)):
             return
-        logs = result["data"]["logs"]
+        logs = config.log
         if not (ban_channel := logs["member_ban_channel"]):
             return
 
@@ -119,9 +119,9 @@ class Mod(commands.Cog):
     @commands.Cog.listener()
     async def on_member_unban(self, guild: discord.Guild, user: discord.User, reason: t.Optional[str],
                               moderator: t.Optional[discord.Member]):
-        if not (result := self.guilds.find_one(guild.id)):
+        if not (config := await self.guild_configs.get(guild.id)):
             return
-        logs = result["data"]["logs"]
+        logs = config.log
         if not (ban_channel := logs["member_ban_channel"]):
             return
 
@@ -219,14 +219,20 @@ class Mod(commands.Cog):
         embed.set_footer(text="No longer losers.")
         await ctx.send(embed=embed)
 
-    @commands.command(name="change_prefix", aliases=["prefix"], description="Changes the server prefix of the bot")
+    @commands.command(name="change_prefix", aliases=["prefix"],
+                      description="Changes the server prefix of the bot. Give several to accept any of them")
     @commands.has_permissions(manage_guild=True)
-    async def change_guild_prefix(self, ctx: commands.Context, prefix: str):
-        if not (result := self.guilds.find_one(ctx.guild.id)):
+    async def change_guild_prefix(self, ctx: commands.Context, *prefixes: str):
+        if not prefixes:
+            return await ctx.send("You're missing a required argument!")
+        if not (config := await self.guild_configs.get(ctx.guild.id)):
             return await ctx.send("There was an issue and I could not find your server in my database!")
 
-        self.guilds.update_one({"_id": ctx.guild.id}, {"$set": {"server_prefix": prefix}})
-        await ctx.send(f"Alright! I changed the server prefix from {result['server_prefix']} to {prefix}!")
+        old_prefixes = ", ".join(config.prefixes)
+        prefixes = tuple(dict.fromkeys(prefixes))
+        await self.guild_configs.update(ctx.guild.id, {"server_prefix": prefixes[0], "server_prefixes": list(prefixes)})
+        self.bot.rebuild_prefix_matcher(ctx.guild.id, prefixes)
+        await ctx.send(f"Alright! I changed the server prefix from {old_prefixes} to {', '.join(prefixes)}!")
 
 
 async def setup(bot):
@@ -251,11 +251,33 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
     """All that high fidelity music stuff"""
     def __init__(self, bot):
         self.bot = bot
-        self.wavelink = wavelink.Client(bot=bot)
-        self.bot.loop.create_task(self.start_nodes())
+        self.wavelink: t.Optional[wavelink.Client] = None
+        self._nodes: t.Optional[asyncio.Task] = None
+
+    async def cog_load(self):
+        self._nodes = asyncio.create_task(self.start_nodes())
+
+    async def cog_unload(self):
+        if self._nodes and not self._nodes.done():
+            self._nodes.cancel()
+
+    def export_state(self) -> dict:
+        # The client owns the node connections and every guild's Player, queue included. Players made before a
+        # reload keep the Player and Queue classes of the module they were made by until they are torn down
+        return {"wavelink": self.wavelink}
+
+    def import_state(self, state: dict):
+        if not (client := state.get("wavelink")):
+            return
+        if self._nodes:
+            self._nodes.cancel()
+        self.wavelink = client
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
+        # Voice states arrive while the guilds are chunked, before start_nodes has made the client
+        if self.wavelink is None:
+            return
         if not member.bot and after.channel is None:
             if not [m for m in before.channel.members if not m.bot]:
                 await self.get_player(member.guild).teardown()
@@ -277,11 +299,15 @@ class Music(commands.Cog, wavelink.WavelinkMixin):
         if isinstance(ctx.channel, discord.DMChannel):
             await ctx.send("Music commands are not available in DMs.")
             return False
+        if self.wavelink is None:
+            await ctx.send("Music is still starting up, try again in a moment.")
+            return False
 
         return True
 
     async def start_nodes(self):
         await self.bot.wait_until_ready()
+        self.wavelink = wavelink.Client(bot=self.bot)
 
         nodes = {
             "US_EAST": {
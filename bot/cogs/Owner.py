@@ -0,0 +1,182 @@
+import asyncio
+import datetime as dt
+import io
+import logging
+import os
+import tempfile
+import time
+import typing as t
+
+import discord
+from discord.ext import commands
+
+from bot import transfer
+
+log = logging.getLogger(__name__)
+
+
+class Owner(commands.Cog):
+    """Diagnostics for the bot owner"""
+    LATENCY_DUMP_INTERVAL = 60 * 60
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._latency_dump = None
+
+    async def cog_load(self):
+        self._latency_dump = asyncio.create_task(self.dump_db_latency())
+
+    async def cog_unload(self):
+        if self._latency_dump:
+            self._latency_dump.cancel()
+
+    async def dump_db_latency(self):
+        await self.bot.wait_until_ready()
+        while True:
+            await asyncio.sleep(self.LATENCY_DUMP_INTERVAL)
+            if not self.bot.STDOUT:
+                continue
+            try:
+                await self.bot.STDOUT.send(f"Database latency since startup\n"
+                                           f"```\n{self.bot.DB_MONITOR.report(limit=15)}\n```")
+            except discord.HTTPException as exc:
+                log.warning(f"Sending the database latency dump failed: {exc!r}")
+
+    async def cog_check(self, ctx):
+        return await self.bot.is_owner(ctx.author)
+
+    @commands.command(name="reload", description="Reloads a cog from disk without reconnecting, "
+                                                 "carrying over the state of cogs that export it. Music players "
+                                                 "that are already connected keep running the old Player code "
+                                                 "until they disconnect")
+    async def reload_command(self, ctx, cog: str):
+        if not (match := next((name for name in self.bot._cogs if name.lower() == cog.lower()), None)):
+            return await ctx.send(f"There is no cog called {cog}. Cogs: {', '.join(sorted(self.bot._cogs))}")
+
+        start = time.perf_counter()
+        try:
+            carried = await self.bot.reload_cog(match)
+        except commands.ExtensionError as exc:
+            log.warning(f"Reloading {match} failed", exc_info=exc)
+            return await ctx.send(f"Reloading {match} failed, the previous version is still loaded: "
+                                  f"`{exc.__cause__ or exc}`")
+        elapsed = (time.perf_counter() - start) * 1000
+        self.bot.log(f"Reloaded {match} cog in {elapsed:,.0f}ms", cog=match, state=carried)
+        state = f", state carried over for {', '.join(carried)}" if carried else ""
+        await ctx.send(f"Reloaded {match} in {elapsed:,.0f}ms{state}")
+
+    @commands.command(name="db_reads", aliases=["dbreads"], description="Shows database reads per processed message")
+    async def db_reads_command(self, ctx):
+        database = self.bot.DATABASE
+        per_message = database.message_reads / database.messages if database.messages else 0
+
+        embed = discord.Embed(title="Database reads", color=self.bot.COLOR, timestamp=dt.datetime.now())
+        embed.add_field(name="Messages", value=f"{database.messages:,}", inline=True)
+        embed.add_field(name="Reads from messages", value=f"{database.message_reads:,}", inline=True)
+        embed.add_field(name="Reads per message", value=f"{per_message:.3f}", inline=True)
+        embed.add_field(name="Total reads", value=f"{database.reads:,}", inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="db_latency", aliases=["dblatency"],
+                      description="Shows database command latency per collection, operation and cog. "
+                                  "Pass reset to clear the recorded latencies")
+    async def db_latency_command(self, ctx, action: str = None):
+        if action == "reset":
+            self.bot.DB_MONITOR.reset()
+            return await ctx.send("Database latency histograms cleared")
+        await ctx.send(f"```\n{self.bot.DB_MONITOR.report(limit=20)}\n```")
+
+    @commands.command(name="listeners", aliases=["listener_latency"],
+                      description="Shows the event listeners that spent the most time, per cog and event. "
+                                  "Pass reset to clear the recorded calls")
+    async def listeners_command(self, ctx, action: str = None):
+        if action == "reset":
+            self.bot.LISTENER_MONITOR.reset()
+            return await ctx.send("Listener histograms cleared")
+        await ctx.send(f"```\n{self.bot.LISTENER_MONITOR.report(limit=20)}\n```")
+
+    @commands.command(name="loop_lag", aliases=["looplag"],
+                      description="Shows event loop lag and the stacks captured while the loop was blocked. "
+                                  "Pass reset to clear them")
+    async def loop_lag_command(self, ctx, action: str = None):
+        monitor = self.bot.LOOP_MONITOR
+        if action == "reset":
+            monitor.reset()
+            return await ctx.send("Loop lag samples and stalls cleared")
+        if not monitor.stalls:
+            return await ctx.send(monitor.summary())
+        await ctx.send(monitor.summary(), file=discord.File(io.BytesIO(monitor.dump().encode("utf-8")),
+                                                            filename="loop_stalls.txt"))
+
+    @commands.command(name="log_queue", aliases=["logqueue"], description="Shows the log delivery backlog")
+    async def log_queue_command(self, ctx):
+        delivery = self.bot.LOG_DELIVERY
+        per_message = delivery.sent_embeds / delivery.sent_messages if delivery.sent_messages else 0
+
+        embed = discord.Embed(title="Log delivery", color=self.bot.COLOR, timestamp=dt.datetime.now())
+        embed.add_field(name="Queued embeds", value=f"{delivery.depth:,}", inline=True)
+        embed.add_field(name="Dropped", value=f"{delivery.dropped:,}", inline=True)
+        embed.add_field(name="Failed", value=f"{delivery.failed:,}", inline=True)
+        embed.add_field(name="Messages sent", value=f"{delivery.sent_messages:,}", inline=True)
+        embed.add_field(name="Embeds per message", value=f"{per_message:.2f}", inline=True)
+        embed.add_field(name="Rate limited", value=f"{delivery.rate_limited:,}", inline=True)
+        if deepest := delivery.deepest():
+            embed.add_field(name="Deepest channels",
+                            value="\n".join(f"<#{channel_id}> {depth:,}" for channel_id, depth in deepest),
+                            inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(name="export_guild", aliases=["exportguild"],
+                      description="Exports a guild's config and members as NDJSON. Pass plain to skip gzip")
+    async def export_guild_command(self, ctx, guild_id: t.Optional[int], compression: str = "gzip"):
+        if not (guild_id := guild_id or (ctx.guild and ctx.guild.id)):
+            return await ctx.send("Give the id of the guild to export, there is no current guild in DMs")
+        suffix = ".ndjson" if compression == "plain" else ".ndjson.gz"
+        path = os.path.join(tempfile.gettempdir(), f"guild-{guild_id}-{dt.datetime.now():%Y%m%d-%H%M%S}{suffix}")
+
+        async with ctx.typing():
+            count = await transfer.export_guild(self.bot.DATABASE, guild_id, path)
+        size = os.path.getsize(path)
+        if ctx.guild and size <= ctx.guild.filesize_limit:
+            await ctx.send(f"Exported guild {guild_id} with {count:,} members", file=discord.File(path))
+            os.remove(path)
+        else:
+            await ctx.send(f"Exported guild {guild_id} with {count:,} members to `{path}` "
+                           f"({size / 1024 / 1024:,.1f} MiB, too large to upload)")
+
+    @commands.command(name="import_guild", aliases=["importguild"],
+                      description="Imports an attached guild export, or one at a path on the bot's host. "
+                                  "Optionally into a different guild")
+    async def import_guild_command(self, ctx, guild_id: t.Optional[int], path: t.Optional[str]):
+        delete_after = False
+        if ctx.message.attachments:
+            attachment = ctx.message.attachments[0]
+            suffix = ".gz" if attachment.filename.endswith(".gz") else ".ndjson"
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as fp:
+                path = fp.name
+            # Streamed to disk in chunks so a large export never sits in memory whole
+            async with self.bot.AIOHTTP_SESSION.get(attachment.url) as response:
+                with open(path, "wb") as fp:
+                    async for chunk in response.content.iter_chunked(1 << 16):
+                        fp.write(chunk)
+            delete_after = True
+        elif not path:
+            return await ctx.send("Attach an export or give the path to one")
+
+        try:
+            async with ctx.typing():
+                guild_id, count = await transfer.import_guild(self.bot.DATABASE, path, guild_id)
+        finally:
+            if delete_after:
+                os.remove(path)
+        self.bot.GUILD_CONFIGS.invalidate(guild_id)
+        self.bot.XP_ACCUMULATOR.forget(guild_id)
+        self.bot.XP_COOLDOWNS.forget(guild_id)
+        self.bot.RANKS.drop(guild_id)
+        # The import can replace members' lock_time, so the guild's locks are read again
+        await self.bot.XP_LOCKS.load(guild_id)
+        await ctx.send(f"Imported {count:,} members into guild {guild_id}")
+
+
+async def setup(bot):
+    await bot.add_cog(Owner(bot))
@@ -0,0 +1,32 @@
+import contextvars
+import typing as t
+
+from discord.ext import commands
+
+if t.TYPE_CHECKING:
+    from .database import GuildConfig, LevelingState
+
+# The snapshot of the message currently being handled. Tasks spawned while handling a message (listeners, commands)
+# inherit it, which lets the database layer attribute reads to the message that caused them.
+CURRENT_SNAPSHOT: contextvars.ContextVar[t.Optional["MessageSnapshot"]] = contextvars.ContextVar("current_snapshot",
+                                                                                                 default=None)
+
+
+class MessageSnapshot:
+    """Guild, leveling and author state fetched once per message and shared by every consumer of that message"""
+    __slots__ = ("guild", "leveling", "member", "may_be_command", "reads")
+
+    def __init__(self, guild: t.Optional["GuildConfig"] = None, leveling: t.Optional["LevelingState"] = None,
+                 member: t.Optional[dict] = None):
+        self.guild = guild
+        self.leveling = leveling
+        self.member = member
+        self.may_be_command = False
+        self.reads = 0
+
+
+class MatrixineContext(commands.Context):
+    """Command context carrying the snapshot built for the invoking message"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.snapshot: MessageSnapshot = CURRENT_SNAPSHOT.get() or MessageSnapshot()
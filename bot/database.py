@@ -0,0 +1,521 @@
+import abc
+import asyncio
+import contextvars
+import functools
+import datetime as dt
+import os
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import discord
+from pymongo import ASCENDING, MongoClient, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from util import leveling_math
+
+from .context import CURRENT_SNAPSHOT
+from .monitoring import CURRENT_CALLER, find_caller
+
+
+def default_guild_document(guild: discord.Guild, prefix: str) -> dict:
+    data = {
+        "join": {
+            "welcome_channel": None,
+            "welcome_message": None,
+            "leave_channel": None,
+            "leave_message": None,
+            "ban_message": None,
+            "auto_roles": []
+        },
+        "log": {
+            "member_joined_channel": None,
+            "member_left_channel": None,
+            "deleted_message_channel": None,
+            "edited_message_channel": None,
+            "role_create_channel": None,
+            "role_deleted_channel": None,
+            "role_edited_channel": None,
+            "member_update_channel": None,
+            "channel_create_channel": None,
+            "channel_edit_channel": None,
+            "channel_delete_channel": None,
+            "mod_ban_channel": None,
+            "mod_kick_channel": None,
+            "mod_mute_channel": None,
+            "mod_purge_channel": None,
+            "voice_update_channel": None,
+            "invite_sent_log_channel": None,
+            "new_account_age": 7,
+            "ignored_channels": [],
+            "ignored_roles": [],
+        },
+        "member": {
+            "leveling_enabled": True,
+            "level_up_channel": None,
+            "no_level_roles": []
+        }
+    }
+
+    return {"_id": guild.id, "name": guild.name, "owner_id": guild.owner_id,
+            "server_prefix": prefix, "blacklisted_channels": [], "data": data}
+
+
+def default_member_document(guild_id: int, user_id: int) -> dict:
+    return {
+        "guild_id": guild_id,
+        "user_id": user_id,
+        "xp": 0,
+        "level": 0,
+        "lock_reason": None,
+        "lock_time": None,
+        "times_locked": 0
+    }
+
+
+def default_leveling_document(guild: discord.Guild, color: int) -> dict:
+    embed = {
+        "title": None,
+        "desc": None,
+        "color": color,
+        "thumbnail": None,
+        "image": None,
+        "footnote": None,
+        "author": None
+    }
+
+    return {"_id": guild.id, "name": guild.name, "multiplier": 1.0, "randomized": False, "xp_cooldown": 0.0,
+            "embed_settings": embed}
+
+
+class GuildConfig:
+    """Typed view of a document in the Guilds collection"""
+    def __init__(self, document: dict):
+        self.document = document
+
+    @property
+    def id(self) -> int:
+        return self.document["_id"]
+
+    @property
+    def prefix(self) -> str:
+        return str(self.document["server_prefix"])
+
+    @property
+    def prefixes(self) -> tuple[str, ...]:
+        """Every prefix the guild accepts, the main one first"""
+        return tuple(self.document.get("server_prefixes") or (self.prefix,))
+
+    @property
+    def join(self) -> dict:
+        return self.document["data"]["join"]
+
+    @property
+    def log(self) -> dict:
+        return self.document["data"]["log"]
+
+    @property
+    def member(self) -> dict:
+        return self.document["data"]["member"]
+
+    @property
+    def leveling_enabled(self) -> bool:
+        return bool(self.member["leveling_enabled"])
+
+    @property
+    def level_up_channel(self) -> t.Optional[str]:
+        return self.member["level_up_channel"]
+
+
+class LevelingState:
+    """Typed view of a document in the Leveling collection"""
+    def __init__(self, document: dict):
+        self.document = document
+
+    @property
+    def id(self) -> int:
+        return self.document["_id"]
+
+    @property
+    def multiplier(self) -> float:
+        # Capped like the curve, larger multipliers were accepted once
+        return min(float(self.document["multiplier"]), leveling_math.MAX_MULTIPLIER)
+
+    @property
+    def randomized(self) -> bool:
+        return bool(self.document["randomized"])
+
+    @property
+    def xp_cooldown(self) -> float:
+        """Seconds a member has to wait between XP gains, 0 when every message counts"""
+        return float(self.document.get("xp_cooldown", 0.0))
+
+    @property
+    def curve(self) -> float:
+        # Clamped, curves outside the range were accepted once and would make the threshold table unbuildable
+        return leveling_math.clamp_curve(float(self.document.get("curve", leveling_math.CURVE)))
+
+    @property
+    def embed_settings(self) -> dict:
+        return self.document["embed_settings"]
+
+
+def apply_set(document: dict, changes: dict):
+    """
+        Applies a MongoDB style $set to a local document.
+
+        Args:
+            document (dict): The document to update in place.
+            changes (dict): Dotted paths mapped to their new values.
+    """
+    for path, value in changes.items():
+        *parents, key = path.split(".")
+        target = document
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[key] = value
+
+
+class Database(abc.ABC):
+    """
+        Async access to the bot's storage.
+
+        Every backend client is blocking, so each query is handed to a small thread pool and awaited from the
+        event loop instead of stalling the gateway. Guild and leveling updates are MongoDB style $set maps of
+        dotted paths, member updates map field names to values.
+    """
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.reads = 0
+        self.message_reads = 0
+        self.messages = 0
+
+    async def run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # The query runs in a copy of this context, tagged with whoever asked for it, so command monitoring can
+        # attribute it from the executor thread
+        context = contextvars.copy_context()
+        context.run(CURRENT_CALLER.set, find_caller())
+        return await loop.run_in_executor(self._executor, functools.partial(context.run, func, *args, **kwargs))
+
+    def count_read(self):
+        self.reads += 1
+        if snapshot := CURRENT_SNAPSHOT.get():
+            snapshot.reads += 1
+            self.message_reads += 1
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def follow_guild_changes(self, on_change: t.Callable[[int], None]):
+        """
+            Blocks, calling on_change with the id of every guild document changed by another writer.
+
+            Returns straight away when the backend cannot push changes, callers then fall back to polling.
+        """
+
+    def stop_following_guild_changes(self):
+        pass
+
+    @abc.abstractmethod
+    async def ensure_indexes(self): ...
+
+    @abc.abstractmethod
+    async def get_guild_config(self, guild_id: int) -> t.Optional[GuildConfig]: ...
+
+    @abc.abstractmethod
+    async def get_guild_documents(self, guild_ids: t.Sequence[int]) -> dict[int, dict]: ...
+
+    @abc.abstractmethod
+    async def update_guild_config(self, guild_id: int, changes: dict): ...
+
+    @abc.abstractmethod
+    async def get_leveling_state(self, guild_id: int) -> t.Optional[LevelingState]: ...
+
+    @abc.abstractmethod
+    async def update_leveling_state(self, guild_id: int, changes: dict): ...
+
+    @abc.abstractmethod
+    async def get_member(self, guild_id: int, user_id: int) -> t.Optional[dict]: ...
+
+    @abc.abstractmethod
+    async def get_member_xp(self, guild_id: int) -> list[tuple[int, float]]: ...
+
+    @abc.abstractmethod
+    async def get_member_page(self, guild_id: int, after_user_id: int, limit: int) -> list[dict]:
+        """Returns up to limit member rows with a user id above after_user_id, ordered by user id"""
+
+    @abc.abstractmethod
+    async def add_member(self, guild_id: int, user_id: int) -> dict: ...
+
+    @abc.abstractmethod
+    async def update_member(self, guild_id: int, user_id: int, changes: dict): ...
+
+    @abc.abstractmethod
+    async def get_active_locks(self) -> list[tuple[int, int, dt.datetime]]: ...
+
+    @abc.abstractmethod
+    async def expire_locks(self, members: list[tuple[int, int]]): ...
+
+    @abc.abstractmethod
+    async def set_member_levels(self, guild_id: int, levels: dict[int, int]): ...
+
+    @abc.abstractmethod
+    async def apply_xp(self, increments: dict[int, dict[int, tuple[float, t.Optional[int]]]]): ...
+
+    @abc.abstractmethod
+    async def create_guild(self, guild: discord.Guild, prefix: str, color: int) -> bool: ...
+
+    @abc.abstractmethod
+    async def delete_guild(self, guild_id: int): ...
+
+    @abc.abstractmethod
+    async def replace_guild(self, guild_document: t.Optional[dict], leveling_document: t.Optional[dict]):
+        """Stores both documents for the guild in their _id, replacing whatever was there"""
+
+    @abc.abstractmethod
+    async def replace_members(self, members: list[dict]):
+        """Stores complete member rows, replacing existing rows for the same guild and user"""
+
+    @abc.abstractmethod
+    async def reconcile_guilds(self, guilds: t.Sequence[discord.Guild], prefix: str,
+                               color: int) -> tuple[list[int], list[int]]: ...
+
+
+class MongoDatabase(Database):
+    """Database backed by the MongoDB collections Guilds, Leveling and LevelingMembers"""
+    def __init__(self, uri: str, name: str = "MatrixineDB", max_workers: int = 8,
+                 event_listeners: t.Sequence = ()):
+        super().__init__(max_workers, "mongo")
+        self.client = MongoClient(uri, tz_aware=True, event_listeners=list(event_listeners))
+        self.db = self.client[name]
+        self.guilds = self.db["Guilds"]
+        self.leveling = self.db["Leveling"]
+        self.members = self.db["LevelingMembers"]
+        self._guild_stream = None
+
+    def close(self):
+        self.stop_following_guild_changes()
+        super().close()
+        self.client.close()
+
+    def follow_guild_changes(self, on_change: t.Callable[[int], None]):
+        try:
+            with self.guilds.watch() as stream:
+                self._guild_stream = stream
+                for change in stream:
+                    if guild_id := change.get("documentKey", {}).get("_id"):
+                        on_change(guild_id)
+        except PyMongoError:
+            # Standalone servers have no change streams
+            return
+
+    def stop_following_guild_changes(self):
+        if self._guild_stream:
+            self._guild_stream.close()
+            self._guild_stream = None
+
+    async def ensure_indexes(self):
+        await self.run(self.members.create_index, [("guild_id", ASCENDING), ("user_id", ASCENDING)], unique=True)
+        await self.run(self.members.create_index, "lock_time", sparse=True)
+
+    async def get_guild_config(self, guild_id: int) -> t.Optional[GuildConfig]:
+        self.count_read()
+        if not (document := await self.run(self.guilds.find_one, {"_id": guild_id})):
+            return None
+        return GuildConfig(document)
+
+    async def get_guild_documents(self, guild_ids: t.Sequence[int]) -> dict[int, dict]:
+        def _fetch():
+            return {document["_id"]: document for document in self.guilds.find({"_id": {"$in": list(guild_ids)}})}
+
+        return await self.run(_fetch)
+
+    async def update_guild_config(self, guild_id: int, changes: dict):
+        await self.run(self.guilds.update_one, {"_id": guild_id}, {"$set": changes})
+
+    async def get_leveling_state(self, guild_id: int) -> t.Optional[LevelingState]:
+        self.count_read()
+        # Guilds that have not been migrated yet still carry the embedded member map, which is never needed here
+        if not (document := await self.run(self.leveling.find_one, {"_id": guild_id}, {"members": 0})):
+            return None
+        return LevelingState(document)
+
+    async def update_leveling_state(self, guild_id: int, changes: dict):
+        await self.run(self.leveling.update_one, {"_id": guild_id}, {"$set": changes})
+
+    async def get_member(self, guild_id: int, user_id: int) -> t.Optional[dict]:
+        self.count_read()
+        return await self.run(self.members.find_one, {"guild_id": guild_id, "user_id": user_id}, {"_id": 0})
+
+    async def get_member_xp(self, guild_id: int) -> list[tuple[int, float]]:
+        def _fetch():
+            cursor = self.members.find({"guild_id": guild_id}, {"_id": 0, "user_id": 1, "xp": 1}, batch_size=10000)
+            return [(row["user_id"], row["xp"]) for row in cursor]
+
+        self.count_read()
+        return await self.run(_fetch)
+
+    async def get_member_page(self, guild_id: int, after_user_id: int, limit: int) -> list[dict]:
+        def _fetch():
+            cursor = self.members.find({"guild_id": guild_id, "user_id": {"$gt": after_user_id}}, {"_id": 0})
+            return list(cursor.sort("user_id", ASCENDING).limit(limit))
+
+        return await self.run(_fetch)
+
+    async def add_member(self, guild_id: int, user_id: int) -> dict:
+        member = default_member_document(guild_id, user_id)
+        await self.run(self.members.update_one, {"guild_id": guild_id, "user_id": user_id},
+                       {"$setOnInsert": member}, upsert=True)
+        return member
+
+    async def update_member(self, guild_id: int, user_id: int, changes: dict):
+        await self.run(self.members.update_one, {"guild_id": guild_id, "user_id": user_id}, {"$set": changes})
+
+    async def get_active_locks(self) -> list[tuple[int, int, dt.datetime]]:
+        def _fetch():
+            cursor = self.members.find({"lock_time": {"$gt": dt.datetime.now(dt.timezone.utc)}},
+                                       {"_id": 0, "guild_id": 1, "user_id": 1, "lock_time": 1})
+            return [(row["guild_id"], row["user_id"], row["lock_time"]) for row in cursor]
+
+        return await self.run(_fetch)
+
+    async def expire_locks(self, members: list[tuple[int, int]]):
+        # Pipeline update so every reason is prefixed server side in one round-trip
+        update = [{"$set": {"lock_reason": {"$concat": ["NO LONGER LOCKED | ",
+                                                        {"$ifNull": ["$lock_reason", "No reason"]}]}}}]
+        operations = [UpdateOne({"guild_id": guild_id, "user_id": user_id}, update) for guild_id, user_id in members]
+        if operations:
+            await self.run(self.members.bulk_write, operations, ordered=False)
+
+    async def set_member_levels(self, guild_id: int, levels: dict[int, int]):
+        """
+            Stores recalculated levels with one update per distinct level rather than one per member.
+
+            Args:
+                guild_id (int): The guild the members belong to.
+                levels (dict): user id -> level.
+        """
+        by_level: dict[int, list[int]] = {}
+        for user_id, level in levels.items():
+            by_level.setdefault(level, []).append(user_id)
+        operations = [UpdateMany({"guild_id": guild_id, "user_id": {"$in": user_ids}}, {"$set": {"level": level}})
+                      for level, user_ids in by_level.items()]
+        if operations:
+            await self.run(self.members.bulk_write, operations, ordered=False)
+
+    async def apply_xp(self, increments: dict[int, dict[int, tuple[float, t.Optional[int]]]]):
+        """
+            Writes buffered XP gains in a single bulk_write, one update per member row.
+
+            Args:
+                increments (dict): guild id -> user id -> (xp to add, new level or None).
+        """
+        operations = []
+        for guild_id, members in increments.items():
+            for user_id, (xp, level) in members.items():
+                update = {"$inc": {"xp": xp}}
+                if level is not None:
+                    update["$max"] = {"level": level}
+                operations.append(UpdateOne({"guild_id": guild_id, "user_id": user_id}, update))
+        if operations:
+            await self.run(self.members.bulk_write, operations, ordered=False)
+
+    async def create_guild(self, guild: discord.Guild, prefix: str, color: int) -> bool:
+        if await self.run(self.guilds.find_one, {"_id": guild.id}, {"_id": 1}):
+            return False
+        await self.run(self.guilds.insert_one, default_guild_document(guild, prefix))
+        await self.run(self.leveling.insert_one, default_leveling_document(guild, color))
+        await self.add_member(guild.id, guild.owner_id)
+        return True
+
+    async def reconcile_guilds(self, guilds: t.Sequence[discord.Guild], prefix: str,
+                               color: int) -> tuple[list[int], list[int]]:
+        """
+            Brings the Guilds and Leveling collections in line with the guilds the bot is actually in.
+
+            Existing ids are read with a projection, missing documents are created with insert_many and documents
+            for guilds the bot has left are removed with delete_many, so the cost is a handful of round-trips no
+            matter how many guilds there are.
+
+            Args:
+                guilds (Sequence[discord.Guild]): Every guild the bot is in.
+                prefix (str): The prefix for new guild documents.
+                color (int): The embed color for new leveling documents.
+
+            Returns:
+                tuple[list[int], list[int]]: The ids of the guilds that were created and removed.
+        """
+        def _insert(collection, documents):
+            try:
+                collection.insert_many(documents, ordered=False)
+            except BulkWriteError as exc:
+                # A guild joined while reconciling already got its document from on_guild_join
+                if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                    raise
+
+        def _reconcile():
+            by_id = {guild.id: guild for guild in guilds}
+            stored_guilds = {document["_id"] for document in self.guilds.find({}, {"_id": 1})}
+            stored_leveling = {document["_id"] for document in self.leveling.find({}, {"_id": 1})}
+
+            missing_guilds = [guild_id for guild_id in by_id if guild_id not in stored_guilds]
+            missing_leveling = [guild_id for guild_id in by_id if guild_id not in stored_leveling]
+            if missing_guilds:
+                _insert(self.guilds, [default_guild_document(by_id[guild_id], prefix) for guild_id in missing_guilds])
+                self.members.bulk_write([UpdateOne({"guild_id": guild_id, "user_id": by_id[guild_id].owner_id},
+                                                   {"$setOnInsert": default_member_document(
+                                                       guild_id, by_id[guild_id].owner_id)},
+                                                   upsert=True)
+                                         for guild_id in missing_guilds], ordered=False)
+            if missing_leveling:
+                _insert(self.leveling, [default_leveling_document(by_id[guild_id], color)
+                                        for guild_id in missing_leveling])
+
+            orphaned = list((stored_guilds | stored_leveling) - by_id.keys())
+            if orphaned:
+                self.guilds.delete_many({"_id": {"$in": orphaned}})
+                self.leveling.delete_many({"_id": {"$in": orphaned}})
+                self.members.delete_many({"guild_id": {"$in": orphaned}})
+            return missing_guilds, orphaned
+
+        return await self.run(_reconcile)
+
+    async def replace_guild(self, guild_document: t.Optional[dict], leveling_document: t.Optional[dict]):
+        if guild_document:
+            await self.run(self.guilds.replace_one, {"_id": guild_document["_id"]}, guild_document, upsert=True)
+        if leveling_document:
+            await self.run(self.leveling.replace_one, {"_id": leveling_document["_id"]}, leveling_document,
+                           upsert=True)
+
+    async def replace_members(self, members: list[dict]):
+        operations = [ReplaceOne({"guild_id": member["guild_id"], "user_id": member["user_id"]},
+                                 {**default_member_document(member["guild_id"], member["user_id"]), **member},
+                                 upsert=True)
+                      for member in members]
+        if operations:
+            await self.run(self.members.bulk_write, operations, ordered=False)
+
+    async def delete_guild(self, guild_id: int):
+        await self.run(self.guilds.delete_one, {"_id": guild_id})
+        await self.run(self.leveling.delete_one, {"_id": guild_id})
+        await self.run(self.members.delete_many, {"guild_id": guild_id})
+
+
+def open_database(event_listeners: t.Sequence = ()) -> Database:
+    """
+        Opens the backend named by STORAGE_BACKEND, "mongo" (the default, connects to MONGO_URI) or "sqlite"
+        (a local file at SQLITE_PATH).
+
+        Args:
+            event_listeners (Sequence): pymongo monitoring listeners, only used by the MongoDB backend.
+
+        Returns:
+            Database: The opened backend.
+    """
+    backend = os.getenv("STORAGE_BACKEND", "mongo").lower()
+    if backend == "mongo":
+        return MongoDatabase(os.getenv("MONGO_URI"), event_listeners=event_listeners)
+    if backend == "sqlite":
+        from .sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(os.getenv("SQLITE_PATH", "matrixine.db"))
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected 'mongo' or 'sqlite'")
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import time
+import typing as t
+
+import discord
+
+log = logging.getLogger(__name__)
+
+
+class LogDelivery:
+    """
+        Per-channel outbound buffers for log embeds.
+
+        The first embed for a channel opens a short window, everything that arrives for that channel during it is
+        sent together, up to ten embeds (and Discord's 6000 character total) per message. Each channel has one
+        sender, so a channel's messages go out one at a time on its rate-limit route, and discord.py's HTTP client
+        paces them from the route's X-RateLimit headers. A 429 that still reaches us is retried after its
+        Retry-After. Buffers are bounded: a full buffer makes the listener wait, and the embed is dropped (and
+        counted) if no room frees up in time.
+    """
+    MAX_EMBEDS = 10
+    MAX_CHARACTERS = 6000
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, window: float = 1.5, max_queue: int = 250, put_timeout: float = 5.0,
+                 idle_timeout: float = 60.0,
+                 on_not_found: t.Optional[t.Callable[[discord.abc.Messageable], t.Awaitable]] = None):
+        self.on_not_found = on_not_found
+        self.window = window
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self.idle_timeout = idle_timeout
+        self.sent_messages = 0
+        self.sent_embeds = 0
+        self.dropped = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+
+    @property
+    def depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def deepest(self, count: int = 5) -> list[tuple[int, int]]:
+        """Returns (channel id, queued embeds) for the channels with the longest backlog"""
+        depths = [(channel_id, queue.qsize()) for channel_id, queue in self._queues.items() if queue.qsize()]
+        return sorted(depths, key=lambda entry: entry[1], reverse=True)[:count]
+
+    async def send(self, channel: t.Optional[discord.abc.Messageable], embed: discord.Embed) -> bool:
+        """Queues an embed for the channel, returns False if it had to be dropped"""
+        if channel is None:
+            return False
+        if not (queue := self._queues.get(channel.id)):
+            queue = self._queues[channel.id] = asyncio.Queue(self.max_queue)
+            self._workers[channel.id] = asyncio.create_task(self._deliver(channel, queue))
+
+        try:
+            queue.put_nowait(embed)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(embed), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        return True
+
+    async def _deliver(self, channel: discord.abc.Messageable, queue: asyncio.Queue):
+        carry = None
+        try:
+            while True:
+                if carry is None:
+                    try:
+                        carry = await asyncio.wait_for(queue.get(), self.idle_timeout)
+                    except asyncio.TimeoutError:
+                        if queue.empty():
+                            return
+                        continue
+                    await asyncio.sleep(self.window)
+
+                batch, characters = [carry], len(carry)
+                carry = queue.get_nowait() if not queue.empty() else None
+                while (carry is not None and len(batch) < self.MAX_EMBEDS
+                       and characters + len(carry) <= self.MAX_CHARACTERS):
+                    batch.append(carry)
+                    characters += len(carry)
+                    carry = queue.get_nowait() if not queue.empty() else None
+
+                try:
+                    await self._send_batch(channel, batch)
+                finally:
+                    for _ in batch:
+                        queue.task_done()
+        finally:
+            self._queues.pop(channel.id, None)
+            self._workers.pop(channel.id, None)
+            # A sender that stops early still settles what it was holding, so close() never waits on it
+            unsent = (carry is not None) + queue.qsize()
+            self.failed += unsent
+            for _ in range(unsent):
+                queue.task_done()
+
+    async def _send_batch(self, channel: discord.abc.Messageable, batch: list[discord.Embed]):
+        for _ in range(self.MAX_ATTEMPTS):
+            try:
+                await channel.send(embeds=batch)
+            except discord.HTTPException as exc:
+                if exc.status != 429:
+                    self.failed += len(batch)
+                    log.warning(f"Sending {len(batch)} log embeds to {channel.id} failed: {exc!r}",
+                                extra={"channel": channel.id, "status": exc.status})
+                    if exc.status == 404 and self.on_not_found:
+                        await self.on_not_found(channel)
+                    return
+                self.rate_limited += 1
+                await asyncio.sleep(float(exc.response.headers.get("Retry-After", 1.0)))
+            except Exception as exc:
+                self.failed += len(batch)
+                log.warning(f"Sending {len(batch)} log embeds to {channel.id} failed: {exc!r}",
+                            extra={"channel": channel.id}, exc_info=True)
+                return
+            else:
+                self.sent_messages += 1
+                self.sent_embeds += len(batch)
+                return
+        self.failed += len(batch)
+
+    async def close(self, timeout: float = 5.0):
+        """Sends whatever is buffered without waiting out the window, then stops the senders"""
+        self.window = 0
+        if queues := list(self._queues.values()):
+            try:
+                await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in queues)), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for worker in list(self._workers.values()):
+            worker.cancel()
+
+
+class WebhookPool:
+    """
+        Bot-owned webhooks for log channels.
+
+        A channel's webhook is created the first time something is logged to it and its id and token are stored in
+        the guild config under data.log.webhooks, so later sends (and restarts) only need the id and token. Webhook
+        requests go out over the bot's shared aiohttp session on the webhook's own rate-limit route, apart from the
+        channel bucket command replies use.
+    """
+    NAME = "Matrixine Logs"
+    # How long a channel where a webhook could not be made logs through the channel before trying again
+    RETRY_AFTER = 15 * 60
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._webhooks: dict[int, discord.Webhook] = {}
+        self._failed: dict[int, float] = {}
+        self._channels: dict[int, tuple[int, int]] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def _partial(self, guild_id: int, channel_id: int, webhook_id: int, token: str) -> discord.Webhook:
+        webhook = discord.Webhook.partial(webhook_id, token, session=self.bot.AIOHTTP_SESSION)
+        self._webhooks[channel_id] = webhook
+        self._channels[webhook.id] = (guild_id, channel_id)
+        return webhook
+
+    async def get(self, config, channel_id: int) -> t.Optional[discord.abc.Messageable]:
+        """Returns the channel's webhook, or the channel itself if a webhook cannot be made there"""
+        if webhook := self._webhooks.get(channel_id):
+            return webhook
+        if stored := config.log.get("webhooks", {}).get(str(channel_id)):
+            return self._partial(config.id, channel_id, stored["id"], stored["token"])
+        if time.monotonic() < self._failed.get(channel_id, 0):
+            return self.bot.get_channel(channel_id)
+
+        async with self._locks.setdefault(channel_id, asyncio.Lock()):
+            if webhook := self._webhooks.get(channel_id):
+                return webhook
+            if not (channel := self.bot.get_channel(channel_id)):
+                return None
+            if time.monotonic() < self._failed.get(channel_id, 0):
+                return channel
+            try:
+                created = await channel.create_webhook(name=self.NAME, reason="Log delivery")
+            except discord.HTTPException:
+                # Usually a missing Manage Webhooks permission, keep logging through the channel
+                self._failed[channel_id] = time.monotonic() + self.RETRY_AFTER
+                return channel
+            self._failed.pop(channel_id, None)
+            await self.bot.GUILD_CONFIGS.update(config.id, {f"data.log.webhooks.{channel_id}": {
+                "id": created.id, "token": created.token}})
+            return self._partial(config.id, channel_id, created.id, created.token)
+
+    async def forget(self, webhook: discord.abc.Messageable):
+        """Drops a webhook that was deleted on Discord, the next log for its channel makes a new one"""
+        if not (owner := self._channels.pop(getattr(webhook, "id", None), None)):
+            return
+        guild_id, channel_id = owner
+        self._webhooks.pop(channel_id, None)
+        await self.bot.GUILD_CONFIGS.update(guild_id, {f"data.log.webhooks.{channel_id}": None})
@@ -0,0 +1,114 @@
+import datetime as dt
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import typing as t
+
+# Attributes every LogRecord has, anything else on a record came in through extra= and is written as a field
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, the extra= fields and any traceback"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records at each level, levels without a rate are always kept"""
+    def __init__(self, rates: dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+        Puts records on the queue for the listener thread, so the loop never waits on a write.
+
+        The stock prepare() folds the traceback into the message. This keeps it apart, so the JSON formatter can
+        write it as its own field.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def parse_sample_rates(spec: str) -> dict[int, float]:
+    """Parses "DEBUG=0.05,INFO=0.5" into {logging.DEBUG: 0.05, logging.INFO: 0.5}"""
+    rates = {}
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, rate = part.partition("=")
+        rates[logging.getLevelName(level.strip().upper())] = float(rate)
+    return rates
+
+
+def setup_logging(path: t.Optional[str] = None, level: t.Optional[str] = None,
+                  sample_rates: t.Optional[dict[int, float]] = None, max_bytes: int = 10 * 1024 * 1024,
+                  backups: int = 5) -> logging.handlers.QueueListener:
+    """
+        Routes the bot's and discord.py's loggers through a queue to a rotating JSON lines file and stdout.
+
+        Defaults come from LOG_PATH, LOG_LEVEL (DEBUG, which includes a line per processed command) and LOG_SAMPLE.
+        discord.py's logger stays at INFO or above, its debug output is every gateway payload.
+
+        Args:
+            path (str): The log file, rotated when it passes max_bytes.
+            level (str): The lowest level logged.
+            sample_rates (dict[int, float]): The fraction of records kept per level.
+            max_bytes (int): The size a log file is rotated at.
+            backups (int): How many rotated files are kept.
+
+        Returns:
+            logging.handlers.QueueListener: The started listener, stop it on shutdown to flush the queue.
+    """
+    path = path or os.getenv("LOG_PATH", os.path.join("logs", "matrixine.log"))
+    level = logging.getLevelName((level or os.getenv("LOG_LEVEL", "DEBUG")).upper())
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE", ""))
+
+    if directory := os.path.dirname(path):
+        os.makedirs(directory, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                        encoding="utf-8")
+    file_handler.setFormatter(JSONFormatter())
+    console_handler = logging.StreamHandler(sys.stdout)
+    console = logging.Formatter("[%(asctime)s] | %(message)s", "%Y-%m-%d %H:%M:%S")
+    console.converter = time.gmtime
+    console_handler.setFormatter(console)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LogQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rates))
+    for name, floor in (("bot", logging.NOTSET), ("discord", logging.INFO)):
+        logger = logging.getLogger(name)
+        logger.setLevel(max(level, floor))
+        for handler in [handler for handler in logger.handlers if isinstance(handler, LogQueueHandler)]:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    return listener
@@ -0,0 +1,102 @@
+import collections
+import typing as t
+import zlib
+
+# Rough per-record cost on top of the content: the record itself, its OrderedDict slot and the int keys
+RECORD_OVERHEAD = 200
+# Short messages do not shrink under zlib, only longer ones are compressed
+COMPRESS_FROM = 96
+
+
+class StoredMessage:
+    """Content of one message, zlib compressed when that makes it smaller"""
+    __slots__ = ("id", "channel_id", "author_id", "_content", "_compressed")
+
+    def __init__(self, message_id: int, channel_id: int, author_id: int, content: str):
+        self.id = message_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+
+    @property
+    def content(self) -> str:
+        data = zlib.decompress(self._content) if self._compressed else self._content
+        return data.decode("utf-8")
+
+    @content.setter
+    def content(self, content: str):
+        data = content.encode("utf-8")
+        if len(data) >= COMPRESS_FROM and len(compressed := zlib.compress(data)) < len(data):
+            self._content, self._compressed = compressed, True
+        else:
+            self._content, self._compressed = data, False
+
+    @property
+    def size(self) -> int:
+        return RECORD_OVERHEAD + len(self._content)
+
+
+class MessageStore:
+    """
+        Recent message content for guilds that log deletes or edits.
+
+        discord.py's message cache is shared by every guild and rolls over quickly, so raw delete and edit events
+        often arrive without the message. This keeps just enough to log them, per guild and within a byte budget,
+        evicting the least recently seen messages first.
+    """
+    def __init__(self, guild_budget: int = 512 * 1024):
+        self.guild_budget = guild_budget
+        self.evicted = 0
+        self._guilds: dict[int, collections.OrderedDict[int, StoredMessage]] = {}
+        self._sizes: dict[int, int] = {}
+
+    def __len__(self):
+        return sum(len(messages) for messages in self._guilds.values())
+
+    @property
+    def size(self) -> int:
+        return sum(self._sizes.values())
+
+    def add(self, guild_id: int, message_id: int, channel_id: int, author_id: int, content: str):
+        if not content:
+            return
+        messages = self._guilds.setdefault(guild_id, collections.OrderedDict())
+        if old := messages.pop(message_id, None):
+            self._sizes[guild_id] -= old.size
+        record = messages[message_id] = StoredMessage(message_id, channel_id, author_id, content)
+        self._sizes[guild_id] = self._sizes.get(guild_id, 0) + record.size
+
+        while self._sizes[guild_id] > self.guild_budget and len(messages) > 1:
+            _, evicted = messages.popitem(last=False)
+            self._sizes[guild_id] -= evicted.size
+            self.evicted += 1
+
+    def get(self, guild_id: int, message_id: int) -> t.Optional[StoredMessage]:
+        if (messages := self._guilds.get(guild_id)) and (record := messages.get(message_id)):
+            messages.move_to_end(message_id)
+            return record
+        return None
+
+    def edit(self, guild_id: int, message_id: int, content: str) -> t.Optional[str]:
+        """Stores the new content and returns what the message said before, if it was known"""
+        if not (record := self.get(guild_id, message_id)):
+            return None
+        before = record.content
+        if content:
+            self.add(guild_id, message_id, record.channel_id, record.author_id, content)
+        else:
+            self.pop(guild_id, message_id)
+        return before
+
+    def pop(self, guild_id: int, message_id: int) -> t.Optional[StoredMessage]:
+        if not (messages := self._guilds.get(guild_id)) or not (record := messages.pop(message_id, None)):
+            return None
+        self._sizes[guild_id] -= record.size
+        if not messages:
+            del self._guilds[guild_id]
+            del self._sizes[guild_id]
+        return record
+
+    def forget(self, guild_id: int):
+        self._guilds.pop(guild_id, None)
+        self._sizes.pop(guild_id, None)
@@ -0,0 +1,42 @@
+import os
+import typing as t
+
+from aiohttp import web
+
+from .monitoring import ListenerMonitor
+
+
+class MetricsServer:
+    """
+        Serves the listener registry as plain text on a local port for scraping.
+
+        The server runs on the bot's own event loop, a scrape renders the registry between two listener calls.
+    """
+    def __init__(self, monitor: ListenerMonitor, host: str = "127.0.0.1", port: int = 9464):
+        self.monitor = monitor
+        self.host = host
+        self.port = port
+        self._runner: t.Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.monitor.exposition(), content_type="text/plain", charset="utf-8",
+                            headers={"Cache-Control": "no-store"})
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def open_metrics(monitor: ListenerMonitor) -> t.Optional[MetricsServer]:
+    """Returns a server for METRICS_HOST and METRICS_PORT, or None when METRICS_PORT is 0"""
+    if not (port := int(os.getenv("METRICS_PORT", "9464"))):
+        return None
+    return MetricsServer(monitor, os.getenv("METRICS_HOST", "127.0.0.1"), port)
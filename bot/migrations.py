@@ -0,0 +1,112 @@
+"""
+    One-off data migrations.
+
+    Usage: python -m bot.migrations <migration> [batch_size]
+"""
+import datetime as dt
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .database import MongoDatabase
+
+
+def migrate_leveling_members(database: MongoDatabase, batch_size: int = 1000) -> int:
+    """
+        Moves the embedded Leveling.members maps into the LevelingMembers collection.
+
+        Guild documents are streamed one at a time and their members are upserted in batches, so memory stays
+        bounded by the largest single guild. A member who already has a row (one created by XP gained since the
+        deploy) gets the legacy XP added on top and keeps the higher level. Merged rows are marked with
+        legacy_merged, so a re-run after an interruption never adds the same XP twice. This makes the migration
+        safe to re-run and safe to run while the bot is online.
+
+        Args:
+            database (MongoDatabase): The database to migrate.
+            batch_size (int): How many member rows go into each bulk_write.
+
+        Returns:
+            int: The number of member rows written.
+    """
+    database.members.create_index([("guild_id", 1), ("user_id", 1)], unique=True)
+    written = 0
+    cursor = database.leveling.find({"members": {"$exists": True}}, {"members": 1}, batch_size=1)
+    for document in cursor:
+        guild_id = document["_id"]
+        operations = []
+        for user_id, member in document["members"].items():
+            operations.append(UpdateOne(
+                {"guild_id": guild_id, "user_id": int(user_id), "legacy_merged": {"$ne": True}},
+                {"$inc": {"xp": member.get("xp", 0)},
+                 "$max": {"level": member.get("level", 0), "times_locked": member.get("times_locked", 0)},
+                 "$set": {"legacy_merged": True},
+                 "$setOnInsert": {"lock_reason": member.get("lock_reason"), "lock_time": member.get("lock_time")}},
+                upsert=True))
+            if len(operations) >= batch_size:
+                written += _merge(database, operations)
+                operations = []
+        if operations:
+            written += _merge(database, operations)
+        database.leveling.update_one({"_id": guild_id}, {"$unset": {"members": ""}})
+        print(f"Migrated guild {guild_id} ({len(document['members'])} members)")
+    return written
+
+
+def _merge(database: MongoDatabase, operations: list[UpdateOne]) -> int:
+    try:
+        result = database.members.bulk_write(operations, ordered=False).bulk_api_result
+    except BulkWriteError as exc:
+        # A row merged by an earlier, interrupted run no longer matches the filter, so its upsert hits the unique index
+        if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+            raise
+        result = exc.details
+    return result["nUpserted"] + result["nModified"]
+
+
+def migrate_lock_times(database: MongoDatabase, batch_size: int = 1000) -> int:
+    """
+        Converts lock_time strings ("%Y-%m-%dT%H:%M:%SZ", UTC) into BSON datetimes.
+
+        Only rows that still hold a string are touched, so the migration is safe to re-run.
+
+        Args:
+            database (MongoDatabase): The database to migrate.
+            batch_size (int): How many member rows go into each bulk_write.
+
+        Returns:
+            int: The number of member rows written.
+    """
+    written = 0
+    operations = []
+    cursor = database.members.find({"lock_time": {"$type": "string"}}, {"lock_time": 1}, batch_size=batch_size)
+    for row in cursor:
+        lock_time = dt.datetime.strptime(row["lock_time"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=dt.timezone.utc)
+        operations.append(UpdateOne({"_id": row["_id"]}, {"$set": {"lock_time": lock_time}}))
+        if len(operations) >= batch_size:
+            written += database.members.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        written += database.members.bulk_write(operations, ordered=False).modified_count
+    return written
+
+
+MIGRATIONS = {
+    "leveling_members": migrate_leveling_members,
+    "lock_times": migrate_lock_times,
+}
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    if len(sys.argv) < 2 or sys.argv[1] not in MIGRATIONS:
+        sys.exit(f"Usage: python -m bot.migrations <{'|'.join(MIGRATIONS)}> [batch_size]")
+
+    db = MongoDatabase(os.getenv("MONGO_URI"))
+    try:
+        count = MIGRATIONS[sys.argv[1]](db, *(int(arg) for arg in sys.argv[2:3]))
+        print(f"Done, {count} rows written")
+    finally:
+        db.close()
@@ -0,0 +1,315 @@
+import asyncio
+import bisect
+import collections
+import contextvars
+import datetime as dt
+import sys
+import threading
+import time
+import traceback
+import typing as t
+
+from pymongo import monitoring
+
+# The cog (or bot module) that issued the database call currently running. Database.run sets it inside a copy of
+# the caller's context, which is what the executor thread runs the query in, so the listener can read it.
+CURRENT_CALLER: contextvars.ContextVar[str] = contextvars.ContextVar("current_caller", default="bot")
+
+# Upper bounds in microseconds, each bucket 25% wider than the last, from 50us to a little over 30s
+BUCKETS = tuple(int(50 * 1.25 ** i) for i in range(61))
+
+
+def find_caller(skip: int = 2) -> str:
+    """Returns the name of the nearest cog on the call stack, or the bot module that made the call"""
+    frame = sys._getframe(skip)
+    fallback = None
+    while frame:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("bot.cogs."):
+            return module.rpartition(".")[2]
+        if fallback is None and module.startswith("bot.") and module != "bot.database":
+            fallback = module.rpartition(".")[2]
+        frame = frame.f_back
+    return fallback or "bot"
+
+
+class LatencyHistogram:
+    """Counts of latencies in fixed exponential buckets"""
+    __slots__ = ("counts", "total", "failures", "micros")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0
+        self.failures = 0
+        self.micros = 0
+
+    def add(self, micros: int, failed: bool = False):
+        self.counts[bisect.bisect_left(BUCKETS, micros)] += 1
+        self.total += 1
+        self.micros += micros
+        if failed:
+            self.failures += 1
+
+    def percentile(self, percent: float) -> int:
+        """Returns the upper bound of the bucket holding the percentile, in microseconds"""
+        if not self.total:
+            return 0
+        target = self.total * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+        return BUCKETS[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.micros / self.total if self.total else 0.0
+
+
+class CommandLatencyMonitor(monitoring.CommandListener):
+    """
+        Records the latency of every MongoDB command per (collection, operation, caller).
+
+        pymongo calls the listener from whichever thread ran the command, so the in-flight map and the histograms
+        are guarded by a lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple, tuple[str, str, str]] = {}
+        self._histograms: dict[tuple[str, str, str], LatencyHistogram] = {}
+
+    @staticmethod
+    def _collection(event: monitoring.CommandStartedEvent) -> str:
+        if event.command_name == "getMore":
+            return str(event.command.get("collection", "-"))
+        if isinstance(target := event.command.get(event.command_name), str):
+            return target
+        return "-"
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return event.connection_id, event.request_id
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        with self._lock:
+            self._inflight[self._key(event)] = (self._collection(event), event.command_name, CURRENT_CALLER.get())
+
+    def _finished(self, event, failed: bool):
+        with self._lock:
+            if not (key := self._inflight.pop(self._key(event), None)):
+                return
+            if not (histogram := self._histograms.get(key)):
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.add(event.duration_micros, failed)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, True)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def stats(self) -> list[tuple[str, str, str, LatencyHistogram]]:
+        """Returns (collection, operation, caller, histogram) rows, busiest first"""
+        with self._lock:
+            rows = [(*key, histogram) for key, histogram in self._histograms.items()]
+        return sorted(rows, key=lambda row: row[3].total, reverse=True)
+
+    def report(self, limit: t.Optional[int] = None) -> str:
+        rows = self.stats()[:limit]
+        if not rows:
+            return "No database commands recorded yet"
+        lines = [f"{'collection':<16} {'op':<10} {'caller':<12} {'count':>8} {'p50':>8} {'p95':>8} {'p99':>8}"]
+        for collection, operation, caller, histogram in rows:
+            lines.append(f"{collection[:16]:<16} {operation[:10]:<10} {caller[:12]:<12} {histogram.total:>8,} "
+                         f"{format_micros(histogram.percentile(50)):>8} {format_micros(histogram.percentile(95)):>8} "
+                         f"{format_micros(histogram.percentile(99)):>8}")
+        return "\n".join(lines)
+
+
+def format_micros(micros: float) -> str:
+    if micros >= 1_000_000:
+        return f"{micros / 1_000_000:.1f}s"
+    if micros >= 1000:
+        return f"{micros / 1000:.1f}ms"
+    return f"{micros:.0f}us"
+
+
+class ListenerMonitor:
+    """
+        Call counts, error counts and latency per (cog, event) for gateway event listeners.
+
+        Matrixine._run_event records every listener it runs. Listeners, the owner command and the metrics endpoint
+        all run on the event loop thread, so the registry is a plain dict and needs no lock.
+    """
+    # Every fourth bucket is exposed for scraping, each about 2.4 times wider than the last
+    EXPOSED_BUCKETS = tuple(range(0, len(BUCKETS), 4))
+
+    def __init__(self):
+        self._histograms: dict[tuple[str, str], LatencyHistogram] = {}
+
+    def record(self, cog: str, event: str, micros: int, failed: bool = False):
+        if not (histogram := self._histograms.get((cog, event))):
+            histogram = self._histograms[(cog, event)] = LatencyHistogram()
+        histogram.add(micros, failed)
+
+    def reset(self):
+        self._histograms.clear()
+
+    def stats(self) -> list[tuple[str, str, LatencyHistogram]]:
+        """Returns (cog, event, histogram) rows, most total time spent first"""
+        rows = [(*key, histogram) for key, histogram in self._histograms.items()]
+        return sorted(rows, key=lambda row: row[2].micros, reverse=True)
+
+    def report(self, limit: t.Optional[int] = None) -> str:
+        rows = self.stats()[:limit]
+        if not rows:
+            return "No listener calls recorded yet"
+        lines = [f"{'cog':<12} {'event':<22} {'calls':>8} {'errors':>6} {'total':>8} {'p50':>8} {'p99':>8}"]
+        for cog, event, histogram in rows:
+            lines.append(f"{cog[:12]:<12} {event.removeprefix('on_')[:22]:<22} {histogram.total:>8,} "
+                         f"{histogram.failures:>6,} {format_micros(histogram.micros):>8} "
+                         f"{format_micros(histogram.percentile(50)):>8} {format_micros(histogram.percentile(99)):>8}")
+        return "\n".join(lines)
+
+    def exposition(self) -> str:
+        """Renders the registry in the Prometheus plain-text format, latencies in seconds"""
+        lines = ["# HELP matrixine_listener_errors_total Listener calls that raised.",
+                 "# TYPE matrixine_listener_errors_total counter"]
+        rows = sorted(self._histograms.items())
+        for (cog, event), histogram in rows:
+            lines.append(f'matrixine_listener_errors_total{{cog="{cog}",event="{event}"}} {histogram.failures}')
+
+        lines += ["# HELP matrixine_listener_seconds Time spent in a listener call.",
+                  "# TYPE matrixine_listener_seconds histogram"]
+        for (cog, event), histogram in rows:
+            labels = f'cog="{cog}",event="{event}"'
+            seen = previous = 0
+            for index in self.EXPOSED_BUCKETS:
+                seen += sum(histogram.counts[previous:index + 1])
+                previous = index + 1
+                lines.append(f'matrixine_listener_seconds_bucket{{{labels},le="{BUCKETS[index] / 1e6:g}"}} {seen}')
+            lines.append(f'matrixine_listener_seconds_bucket{{{labels},le="+Inf"}} {histogram.total}')
+            lines.append(f"matrixine_listener_seconds_sum{{{labels}}} {histogram.micros / 1e6:.6f}")
+            lines.append(f"matrixine_listener_seconds_count{{{labels}}} {histogram.total}")
+        return "\n".join(lines) + "\n"
+
+
+class LoopStall:
+    """One time the event loop stopped running callbacks for longer than the threshold"""
+    __slots__ = ("at", "task", "stack", "lag")
+
+    def __init__(self, at: dt.datetime, task: str, stack: str):
+        self.at = at
+        # Best effort, read off the loop thread while the stall was captured
+        self.task = task
+        self.stack = stack
+        # Filled in by the heartbeat once the loop runs again
+        self.lag: t.Optional[float] = None
+
+
+class LoopLagMonitor:
+    """
+        Measures event-loop scheduling lag and captures the stack of whatever blocks the loop.
+
+        A heartbeat task sleeps for a fixed interval and records how late it wakes up. A daemon thread watches the
+        heartbeat, and once it is overdue by more than the threshold, takes the loop thread's current stack from
+        sys._current_frames. That stack is the blocking call itself, a sync database call, requests.get or an image
+        filter, and a best-effort name of the task that made it. Stalls are kept in a ring buffer.
+    """
+    STACK_FRAMES = 20
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, capacity: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = LatencyHistogram()
+        self.max_lag = 0.0
+        self.stalls: collections.deque[LoopStall] = collections.deque(maxlen=capacity)
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: t.Optional[int] = None
+        self._beat = time.monotonic()
+        self._stall: t.Optional[LoopStall] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat: t.Optional[asyncio.Task] = None
+        self._watcher: t.Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts the heartbeat and the watcher, from a coroutine on the loop to be watched"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        self._watcher = threading.Thread(target=self._watch, name="loop-lag-watcher", daemon=True)
+        self._watcher.start()
+
+    async def _run_heartbeat(self):
+        while True:
+            self._beat = start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self.lag.add(int(lag * 1_000_000))
+            self.max_lag = max(self.max_lag, lag)
+            with self._lock:
+                if self._stall:
+                    self._stall.lag, self._stall = lag, None
+
+    def _watch(self):
+        captured = None
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if beat == captured or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            if not (frame := sys._current_frames().get(self._loop_thread)):
+                continue
+            # Captured once per stall, the stack does not change while the call that blocks is still running
+            captured = beat
+            stall = LoopStall(dt.datetime.now(dt.timezone.utc), self._current_task_name(),
+                              "".join(traceback.format_list(traceback.extract_stack(frame)[-self.STACK_FRAMES:])))
+            del frame
+            with self._lock:
+                if self._beat != beat:
+                    # The loop got going again while the stack was being taken
+                    continue
+                self._stall = stall
+                self.stalls.append(stall)
+
+    def _current_task_name(self) -> str:
+        # The loop's current task is read from this thread without synchronisation. If the loop moves on around
+        # the stack capture, the name can belong to another step, or the lookup can fail outright
+        try:
+            task = asyncio.current_task(self._loop)
+            return f"{task.get_name()} ({getattr(task.get_coro(), '__qualname__', '-')})" if task else "-"
+        except Exception:
+            return "-"
+
+    def reset(self):
+        self.lag = LatencyHistogram()
+        self.max_lag = 0.0
+        with self._lock:
+            self.stalls.clear()
+
+    def summary(self) -> str:
+        return (f"Loop lag p50 {format_micros(self.lag.percentile(50))}, p99 {format_micros(self.lag.percentile(99))}, "
+                f"max {format_micros(self.max_lag * 1_000_000)} over {self.lag.total:,} beats, "
+                f"{len(self.stalls)} stalls over {format_micros(self.threshold * 1_000_000)} kept")
+
+    def dump(self, limit: t.Optional[int] = None) -> str:
+        """Renders the most recent stalls, newest first, with their stacks"""
+        with self._lock:
+            stalls = list(self.stalls)[::-1][:limit]
+        blocks = [self.summary()]
+        for stall in stalls:
+            lag = format_micros(stall.lag * 1_000_000) if stall.lag is not None else "still blocked"
+            blocks.append(f"{stall.at:%Y-%m-%d %H:%M:%S} UTC | {lag} | task (best effort) {stall.task}\n{stall.stack}")
+        return "\n\n".join(blocks)
+
+    async def close(self):
+        self._stop.set()
+        if self._heartbeat:
+            self._heartbeat.cancel()
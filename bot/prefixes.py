@@ -0,0 +1,38 @@
+import re
+import typing as t
+
+
+class PrefixMatcher:
+    """
+        One guild's prefixes compiled into a single case-insensitive pattern.
+
+        The pattern also accepts a mention of the bot, so deciding whether a message could be a command, and which
+        prefix it used, is one anchored regex match instead of a scan over every prefix and its variants.
+    """
+    __slots__ = ("prefixes", "_pattern")
+
+    def __init__(self, prefixes: t.Iterable[str], bot_id: int):
+        self.prefixes = tuple(prefixes)
+        # Longest first, so "m!!" wins over "m!" when a guild has both. The raw prefixes are matched with
+        # IGNORECASE, casefolding them first would turn "ß" into "ss" and stop it matching itself
+        alternatives = sorted(set(self.prefixes), key=len, reverse=True)
+        # A mention counts as a prefix only when whitespace follows it, like commands.when_mentioned
+        self._pattern = re.compile(rf"<@!?{bot_id}>\s+|(?:{'|'.join(map(re.escape, alternatives))})",
+                                   re.IGNORECASE)
+
+    def match(self, content: str) -> t.Optional[str]:
+        """Returns the prefix exactly as it appears at the start of content, or None"""
+        if match := self._pattern.match(content):
+            return match.group()
+        return None
+
+    def command_prefix(self, content: str) -> list[str]:
+        """
+            The value for commands.Bot's prefix callable.
+
+            Returns the matched text when there is one, so discord.py's own prefix scan compares a single string,
+            and the configured prefixes otherwise.
+        """
+        if matched := self.match(content):
+            return [matched]
+        return list(self.prefixes)
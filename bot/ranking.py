@@ -0,0 +1,101 @@
+import asyncio
+import typing as t
+
+from util.skiplist import IndexableSkipList
+
+from .database import Database
+
+
+class Leaderboard:
+    """One guild's members ordered by XP, highest first"""
+    def __init__(self):
+        self._ranked = IndexableSkipList()
+        self._xp: dict[int, float] = {}
+
+    def __len__(self):
+        return len(self._ranked)
+
+    def update(self, user_id: int, xp: float):
+        if (old_xp := self._xp.get(user_id)) is not None:
+            if old_xp == xp:
+                return
+            self._ranked.remove((-old_xp, user_id))
+        self._xp[user_id] = xp
+        self._ranked.insert((-xp, user_id))
+
+    def remove(self, user_id: int):
+        if (xp := self._xp.pop(user_id, None)) is not None:
+            self._ranked.remove((-xp, user_id))
+
+    def rank(self, user_id: int) -> t.Optional[int]:
+        """Returns the one based rank of a member, or None if they are not ranked"""
+        if (xp := self._xp.get(user_id)) is None:
+            return None
+        return self._ranked.index((-xp, user_id)) + 1
+
+    def page(self, offset: int, count: int) -> list[tuple[int, int, float]]:
+        """Returns (rank, user id, xp) for up to count members starting at the zero based offset"""
+        entries = []
+        for rank, (negative_xp, user_id) in enumerate(self._ranked.iter_from(offset), start=offset + 1):
+            if len(entries) >= count:
+                break
+            entries.append((rank, user_id, -negative_xp))
+        return entries
+
+
+class RankIndex:
+    """
+        Per-guild leaderboards kept in memory.
+
+        Boards are rebuilt lazily from LevelingMembers the first time a guild asks for one, and are then kept
+        current by the XP path, so a rank lookup never has to sort the member list.
+    """
+    def __init__(self, database: Database):
+        self.database = database
+        self._boards: dict[int, Leaderboard] = {}
+        self._loading: dict[int, asyncio.Task] = {}
+        self._updates_while_loading: dict[int, dict[int, float]] = {}
+
+    async def get(self, guild_id: int, pending: t.Iterable[tuple[int, dict]] = ()) -> Leaderboard:
+        if (board := self._boards.get(guild_id)) is not None:
+            return board
+        if not (task := self._loading.get(guild_id)):
+            updates = self._updates_while_loading[guild_id] = {}
+            task = self._loading[guild_id] = asyncio.create_task(self._build(guild_id, list(pending), updates))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if self._loading.get(guild_id) is task:
+                del self._loading[guild_id]
+
+    async def _build(self, guild_id: int, pending: list[tuple[int, dict]], updates: dict[int, float]) -> Leaderboard:
+        board = Leaderboard()
+        try:
+            stored = await self.database.get_member_xp(guild_id)
+        except Exception:
+            if self._updates_while_loading.get(guild_id) is updates:
+                del self._updates_while_loading[guild_id]
+            raise
+        for user_id, xp in stored:
+            board.update(user_id, xp)
+        # XP that has not been flushed yet is newer than what was just read
+        for user_id, member in pending:
+            board.update(user_id, member["xp"])
+        for user_id, xp in updates.items():
+            board.update(user_id, xp)
+        # A guild dropped while this ran has a stale read, the board goes to the callers but is not kept
+        if self._updates_while_loading.get(guild_id) is updates:
+            del self._updates_while_loading[guild_id]
+            self._boards[guild_id] = board
+        return board
+
+    def update(self, guild_id: int, user_id: int, xp: float):
+        if (board := self._boards.get(guild_id)) is not None:
+            board.update(user_id, xp)
+        elif guild_id in self._updates_while_loading:
+            self._updates_while_loading[guild_id][user_id] = xp
+
+    def drop(self, guild_id: int):
+        self._boards.pop(guild_id, None)
+        self._loading.pop(guild_id, None)
+        self._updates_while_loading.pop(guild_id, None)
@@ -0,0 +1,281 @@
+import datetime as dt
+import json
+import sqlite3
+import time
+import typing as t
+
+import discord
+
+from .database import (Database, GuildConfig, LevelingState, apply_set, default_guild_document,
+                       default_leveling_document, default_member_document)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guilds (
+    id INTEGER PRIMARY KEY,
+    document TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leveling (
+    id INTEGER PRIMARY KEY,
+    document TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    xp REAL NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 0,
+    lock_reason TEXT,
+    lock_time REAL,
+    times_locked INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS members_lock_time ON members (lock_time) WHERE lock_time IS NOT NULL;
+"""
+
+MEMBER_COLUMNS = ("guild_id", "user_id", "xp", "level", "lock_reason", "lock_time", "times_locked")
+
+# Statements are module constants so sqlite3's statement cache compiles each of them once per connection
+SELECT_GUILD = "SELECT document FROM guilds WHERE id = ?"
+UPDATE_GUILD = "UPDATE guilds SET document = ? WHERE id = ?"
+INSERT_GUILD = "INSERT OR IGNORE INTO guilds (id, document) VALUES (?, ?)"
+DELETE_GUILD = "DELETE FROM guilds WHERE id = ?"
+SELECT_LEVELING = "SELECT document FROM leveling WHERE id = ?"
+UPDATE_LEVELING = "UPDATE leveling SET document = ? WHERE id = ?"
+INSERT_LEVELING = "INSERT OR IGNORE INTO leveling (id, document) VALUES (?, ?)"
+DELETE_LEVELING = "DELETE FROM leveling WHERE id = ?"
+SELECT_MEMBER = f"SELECT {', '.join(MEMBER_COLUMNS)} FROM members WHERE guild_id = ? AND user_id = ?"
+SELECT_MEMBER_XP = "SELECT user_id, xp FROM members WHERE guild_id = ?"
+SELECT_MEMBER_PAGE = (f"SELECT {', '.join(MEMBER_COLUMNS)} FROM members WHERE guild_id = ? AND user_id > ? "
+                      f"ORDER BY user_id LIMIT ?")
+INSERT_MEMBER = f"INSERT OR IGNORE INTO members ({', '.join(MEMBER_COLUMNS)}) VALUES ({', '.join('?' * 7)})"
+REPLACE_GUILD = "INSERT OR REPLACE INTO guilds (id, document) VALUES (?, ?)"
+REPLACE_LEVELING = "INSERT OR REPLACE INTO leveling (id, document) VALUES (?, ?)"
+REPLACE_MEMBER = f"INSERT OR REPLACE INTO members ({', '.join(MEMBER_COLUMNS)}) VALUES ({', '.join('?' * 7)})"
+DELETE_MEMBERS = "DELETE FROM members WHERE guild_id = ?"
+SELECT_ACTIVE_LOCKS = "SELECT guild_id, user_id, lock_time FROM members WHERE lock_time > ?"
+EXPIRE_LOCK = ("UPDATE members SET lock_reason = 'NO LONGER LOCKED | ' || COALESCE(lock_reason, 'No reason') "
+               "WHERE guild_id = ? AND user_id = ?")
+SET_LEVEL = "UPDATE members SET level = ? WHERE guild_id = ? AND user_id = ?"
+APPLY_XP = ("UPDATE members SET xp = xp + ?, level = MAX(level, COALESCE(?, level)) "
+            "WHERE guild_id = ? AND user_id = ?")
+
+# SQLite's default limit on bound parameters per statement is 999
+IN_CHUNK = 900
+
+
+def _to_timestamp(value):
+    return value.timestamp() if isinstance(value, dt.datetime) else value
+
+
+def _member_row(member: dict) -> tuple:
+    return tuple(_to_timestamp(member[column]) for column in MEMBER_COLUMNS)
+
+
+class SQLiteDatabase(Database):
+    """
+        Database stored in a local SQLite file.
+
+        Guild and leveling documents are kept as JSON so they share the MongoDB document shape and dotted $set
+        updates, members are a real table. The connection runs in WAL mode so readers never wait on the writer, and
+        all writes for one call go through a single transaction.
+    """
+    def __init__(self, path: str):
+        # One worker owns the connection, which serializes access without sqlite3's own locking
+        super().__init__(1, "sqlite")
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                          cached_statements=256)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+    def _transaction(self, func: t.Callable, *args):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+        return result
+
+    async def write(self, func: t.Callable, *args):
+        return await self.run(self._transaction, func, *args)
+
+    def _select_ids(self, table: str) -> set[int]:
+        return {row[0] for row in self.connection.execute(f"SELECT id FROM {table}")}
+
+    async def ensure_indexes(self):
+        await self.run(self.connection.executescript, INDEXES)
+
+    def _get_document(self, statement: str, row_id: int) -> t.Optional[dict]:
+        if not (row := self.connection.execute(statement, (row_id,)).fetchone()):
+            return None
+        return json.loads(row[0])
+
+    def _update_document(self, select: str, update: str, row_id: int, changes: dict):
+        if (document := self._get_document(select, row_id)) is None:
+            return
+        apply_set(document, changes)
+        self.connection.execute(update, (json.dumps(document), row_id))
+
+    async def get_guild_config(self, guild_id: int) -> t.Optional[GuildConfig]:
+        self.count_read()
+        if not (document := await self.run(self._get_document, SELECT_GUILD, guild_id)):
+            return None
+        return GuildConfig(document)
+
+    async def get_guild_documents(self, guild_ids: t.Sequence[int]) -> dict[int, dict]:
+        def _fetch():
+            found = {}
+            for start in range(0, len(guild_ids), IN_CHUNK):
+                chunk = guild_ids[start:start + IN_CHUNK]
+                cursor = self.connection.execute(f"SELECT id, document FROM guilds WHERE id IN "
+                                                 f"({', '.join('?' * len(chunk))})", chunk)
+                found.update((guild_id, json.loads(document)) for guild_id, document in cursor)
+            return found
+
+        return await self.run(_fetch)
+
+    async def update_guild_config(self, guild_id: int, changes: dict):
+        await self.write(self._update_document, SELECT_GUILD, UPDATE_GUILD, guild_id, changes)
+
+    async def get_leveling_state(self, guild_id: int) -> t.Optional[LevelingState]:
+        self.count_read()
+        if not (document := await self.run(self._get_document, SELECT_LEVELING, guild_id)):
+            return None
+        return LevelingState(document)
+
+    async def update_leveling_state(self, guild_id: int, changes: dict):
+        await self.write(self._update_document, SELECT_LEVELING, UPDATE_LEVELING, guild_id, changes)
+
+    @staticmethod
+    def _member_from_row(row: tuple) -> dict:
+        member = dict(zip(MEMBER_COLUMNS, row))
+        if member["lock_time"] is not None:
+            member["lock_time"] = dt.datetime.fromtimestamp(member["lock_time"], dt.timezone.utc)
+        return member
+
+    def _get_member(self, guild_id: int, user_id: int) -> t.Optional[dict]:
+        if not (row := self.connection.execute(SELECT_MEMBER, (guild_id, user_id)).fetchone()):
+            return None
+        return self._member_from_row(row)
+
+    async def get_member(self, guild_id: int, user_id: int) -> t.Optional[dict]:
+        self.count_read()
+        return await self.run(self._get_member, guild_id, user_id)
+
+    async def get_member_xp(self, guild_id: int) -> list[tuple[int, float]]:
+        self.count_read()
+        return await self.run(lambda: self.connection.execute(SELECT_MEMBER_XP, (guild_id,)).fetchall())
+
+    async def get_member_page(self, guild_id: int, after_user_id: int, limit: int) -> list[dict]:
+        def _fetch():
+            cursor = self.connection.execute(SELECT_MEMBER_PAGE, (guild_id, after_user_id, limit))
+            return [self._member_from_row(row) for row in cursor]
+
+        return await self.run(_fetch)
+
+    async def add_member(self, guild_id: int, user_id: int) -> dict:
+        member = default_member_document(guild_id, user_id)
+        await self.run(self.connection.execute, INSERT_MEMBER, _member_row(member))
+        return member
+
+    async def update_member(self, guild_id: int, user_id: int, changes: dict):
+        if unknown := set(changes) - set(MEMBER_COLUMNS[2:]):
+            raise ValueError(f"Unknown member fields: {', '.join(sorted(unknown))}")
+        columns = sorted(changes)
+        statement = (f"UPDATE members SET {', '.join(f'{column} = ?' for column in columns)} "
+                     f"WHERE guild_id = ? AND user_id = ?")
+        await self.run(self.connection.execute, statement,
+                       (*(_to_timestamp(changes[column]) for column in columns), guild_id, user_id))
+
+    async def get_active_locks(self) -> list[tuple[int, int, dt.datetime]]:
+        def _fetch():
+            cursor = self.connection.execute(SELECT_ACTIVE_LOCKS, (time.time(),))
+            return [(guild_id, user_id, dt.datetime.fromtimestamp(lock_time, dt.timezone.utc))
+                    for guild_id, user_id, lock_time in cursor]
+
+        return await self.run(_fetch)
+
+    async def expire_locks(self, members: list[tuple[int, int]]):
+        if members:
+            await self.write(self.connection.executemany, EXPIRE_LOCK, members)
+
+    async def set_member_levels(self, guild_id: int, levels: dict[int, int]):
+        if levels:
+            await self.write(self.connection.executemany, SET_LEVEL,
+                             [(level, guild_id, user_id) for user_id, level in levels.items()])
+
+    async def apply_xp(self, increments: dict[int, dict[int, tuple[float, t.Optional[int]]]]):
+        rows = [(xp, level, guild_id, user_id)
+                for guild_id, members in increments.items()
+                for user_id, (xp, level) in members.items()]
+        if rows:
+            await self.write(self.connection.executemany, APPLY_XP, rows)
+
+    async def create_guild(self, guild: discord.Guild, prefix: str, color: int) -> bool:
+        def _create():
+            document = default_guild_document(guild, prefix)
+            if not self.connection.execute(INSERT_GUILD, (guild.id, json.dumps(document))).rowcount:
+                return False
+            self.connection.execute(INSERT_LEVELING, (guild.id, json.dumps(default_leveling_document(guild, color))))
+            self.connection.execute(INSERT_MEMBER, _member_row(default_member_document(guild.id, guild.owner_id)))
+            return True
+
+        return await self.write(_create)
+
+    def _delete_guilds(self, guild_ids: list[int]):
+        rows = [(guild_id,) for guild_id in guild_ids]
+        self.connection.executemany(DELETE_GUILD, rows)
+        self.connection.executemany(DELETE_LEVELING, rows)
+        self.connection.executemany(DELETE_MEMBERS, rows)
+
+    async def replace_guild(self, guild_document: t.Optional[dict], leveling_document: t.Optional[dict]):
+        def _replace():
+            if guild_document:
+                self.connection.execute(REPLACE_GUILD, (guild_document["_id"], json.dumps(guild_document)))
+            if leveling_document:
+                self.connection.execute(REPLACE_LEVELING, (leveling_document["_id"], json.dumps(leveling_document)))
+
+        await self.write(_replace)
+
+    async def replace_members(self, members: list[dict]):
+        if members:
+            await self.write(self.connection.executemany, REPLACE_MEMBER,
+                             [_member_row({**default_member_document(member["guild_id"], member["user_id"]), **member})
+                              for member in members])
+
+    async def delete_guild(self, guild_id: int):
+        await self.write(self._delete_guilds, [guild_id])
+
+    async def reconcile_guilds(self, guilds: t.Sequence[discord.Guild], prefix: str,
+                               color: int) -> tuple[list[int], list[int]]:
+        def _reconcile():
+            by_id = {guild.id: guild for guild in guilds}
+            stored_guilds = self._select_ids("guilds")
+            stored_leveling = self._select_ids("leveling")
+
+            missing_guilds = [guild_id for guild_id in by_id if guild_id not in stored_guilds]
+            missing_leveling = [guild_id for guild_id in by_id if guild_id not in stored_leveling]
+            self.connection.executemany(INSERT_GUILD, [
+                (guild_id, json.dumps(default_guild_document(by_id[guild_id], prefix)))
+                for guild_id in missing_guilds])
+            self.connection.executemany(INSERT_MEMBER, [
+                _member_row(default_member_document(guild_id, by_id[guild_id].owner_id))
+                for guild_id in missing_guilds])
+            self.connection.executemany(INSERT_LEVELING, [
+                (guild_id, json.dumps(default_leveling_document(by_id[guild_id], color)))
+                for guild_id in missing_leveling])
+
+            orphaned = list((stored_guilds | stored_leveling) - by_id.keys())
+            self._delete_guilds(orphaned)
+            return missing_guilds, orphaned
+
+        return await self.write(_reconcile)
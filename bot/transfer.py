@@ -0,0 +1,163 @@
+"""
+    Guild data export and import as NDJSON, gzip compressed when the path ends in .gz.
+
+    The first lines hold the guild and leveling documents, every following line is one member row. Members are
+    read and written a page at a time, so memory stays bounded by the batch size however large the guild is.
+
+    Usage: python -m bot.transfer export <guild_id> <path> [batch_size]
+           python -m bot.transfer import <path> [guild_id] [batch_size]
+"""
+import asyncio
+import datetime as dt
+import gzip
+import json
+import sys
+import typing as t
+
+from dotenv import load_dotenv
+
+from .database import Database, open_database
+
+BATCH_SIZE = 5000
+
+
+def _encode(value):
+    if isinstance(value, dt.datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def _decode(document: dict):
+    if len(document) == 1 and "$date" in document:
+        return dt.datetime.fromisoformat(document["$date"])
+    return document
+
+
+def dumps(record: dict) -> str:
+    return json.dumps(record, default=_encode, separators=(",", ":")) + "\n"
+
+
+def loads(line: str) -> dict:
+    return json.loads(line, object_hook=_decode)
+
+
+def open_file(path: str, mode: str) -> t.IO:
+    if path.endswith(".gz"):
+        # A low compression level keeps the export close to disk speed while still shrinking it several times
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=5)
+    return open(path, mode, encoding="utf-8")
+
+
+async def export_guild(database: Database, guild_id: int, path: str, batch_size: int = BATCH_SIZE) -> int:
+    """
+        Streams a guild's documents and member rows into an NDJSON file.
+
+        Args:
+            database (Database): The database to read from.
+            guild_id (int): The guild to export.
+            path (str): Where to write the export, compressed when it ends in .gz.
+            batch_size (int): How many member rows are read and written at a time.
+
+        Returns:
+            int: The number of member rows exported.
+    """
+    loop = asyncio.get_running_loop()
+    config = await database.get_guild_config(guild_id)
+    leveling = await database.get_leveling_state(guild_id)
+
+    fp = await loop.run_in_executor(None, open_file, path, "w")
+    try:
+        header = dumps({"kind": "guild", "document": config.document if config else None})
+        header += dumps({"kind": "leveling", "document": leveling.document if leveling else None})
+        await loop.run_in_executor(None, fp.write, header)
+
+        exported = 0
+        after_user_id = -1
+        while members := await database.get_member_page(guild_id, after_user_id, batch_size):
+            after_user_id = members[-1]["user_id"]
+            lines = "".join(dumps({"kind": "member", **member}) for member in members)
+            await loop.run_in_executor(None, fp.write, lines)
+            exported += len(members)
+    finally:
+        await loop.run_in_executor(None, fp.close)
+    return exported
+
+
+def _read_batches(fp: t.IO, batch_size: int) -> t.Iterator[list[dict]]:
+    batch = []
+    for line in fp:
+        if not line.strip():
+            continue
+        batch.append(loads(line))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def import_guild(database: Database, path: str, guild_id: t.Optional[int] = None,
+                       batch_size: int = BATCH_SIZE) -> tuple[int, int]:
+    """
+        Loads an export written by export_guild, replacing the stored documents and member rows.
+
+        Parsing happens off the event loop one batch at a time, and each batch of members goes to the database as
+        a single bulk write.
+
+        Args:
+            database (Database): The database to write to.
+            path (str): The export to read, decompressed when it ends in .gz.
+            guild_id (int): Import into this guild instead of the one the export was taken from.
+            batch_size (int): How many member rows go into each bulk write.
+
+        Returns:
+            tuple[int, int]: The guild id the data was imported into and the number of member rows written.
+    """
+    loop = asyncio.get_running_loop()
+    fp = await loop.run_in_executor(None, open_file, path, "r")
+    try:
+        batches = _read_batches(fp, batch_size)
+        imported = 0
+        while batch := await loop.run_in_executor(None, next, batches, None):
+            members = []
+            for record in batch:
+                kind = record.pop("kind", None)
+                if kind in ("guild", "leveling"):
+                    if (document := record["document"]) is None:
+                        continue
+                    guild_id = document["_id"] = guild_id or document["_id"]
+                    await database.replace_guild(document if kind == "guild" else None,
+                                                 document if kind == "leveling" else None)
+                elif kind == "member":
+                    if guild_id is None:
+                        raise ValueError("The export has member rows before its guild document, pass a guild id")
+                    record["guild_id"] = guild_id
+                    members.append(record)
+                else:
+                    raise ValueError(f"Unknown record kind {kind!r} in {path}")
+            await database.replace_members(members)
+            imported += len(members)
+    finally:
+        await loop.run_in_executor(None, fp.close)
+    return guild_id, imported
+
+
+async def _main(args: list[str]):
+    database = open_database()
+    try:
+        if args[0] == "export":
+            count = await export_guild(database, int(args[1]), args[2], *(int(arg) for arg in args[3:4]))
+            print(f"Exported guild {args[1]} with {count:,} members to {args[2]}")
+        else:
+            guild_id, count = await import_guild(database, args[1], *(int(arg) for arg in args[2:4]))
+            print(f"Imported {count:,} members into guild {guild_id} from {args[1]}")
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import") or (sys.argv[1] == "export" and len(sys.argv) < 4):
+        sys.exit("Usage: python -m bot.transfer export <guild_id> <path> [batch_size]\n"
+                 "       python -m bot.transfer import <path> [guild_id] [batch_size]")
+    asyncio.run(_main(sys.argv[1:]))
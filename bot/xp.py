@@ -0,0 +1,278 @@
+import asyncio
+import datetime as dt
+import heapq
+import logging
+import time
+import typing as t
+
+from .database import Database
+
+log = logging.getLogger(__name__)
+
+
+class XPAccumulator:
+    """
+        Write-behind buffer for XP gains.
+
+        Increments are applied to an in-memory view straight away so level ups are detected on the message that
+        caused them, and are written to the database as one bulk $inc every few seconds or after enough events.
+    """
+    def __init__(self, database: Database, flush_interval: float = 5.0, flush_threshold: int = 500):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.flushes = 0
+        self.flushed_events = 0
+        # guild -> user -> view, only members with increments that are pending, mid-flush or recently flushed have one
+        self._members: dict[int, dict[int, dict]] = {}
+        self._pending: dict[tuple[int, int], list] = {}
+        # (guild, user) -> when their increments were written, the view outlives that by a flush interval
+        self._flushed: dict[tuple[int, int], float] = {}
+        self._events = 0
+        self._wakeup = asyncio.Event()
+        self._task: t.Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def current(self, guild_id: int, user_id: int, member: dict) -> dict:
+        """Returns the member as seen by the bot, including increments that have not been flushed yet"""
+        return self._members.get(guild_id, {}).get(user_id, member)
+
+    def members_of(self, guild_id: int) -> list[tuple[int, dict]]:
+        return list(self._members.get(guild_id, {}).items())
+
+    def add_xp(self, guild_id: int, user_id: int, member: dict, amount: float) -> dict:
+        key = (guild_id, user_id)
+        members = self._members.setdefault(guild_id, {})
+        if not (current := members.get(user_id)):
+            current = members[user_id] = {"xp": member["xp"], "level": member["level"]}
+        current["xp"] += amount
+
+        pending = self._pending.setdefault(key, [0.0, None])
+        pending[0] += amount
+
+        self._events += 1
+        if self._events >= self.flush_threshold:
+            self._wakeup.set()
+        return current
+
+    def set_level(self, guild_id: int, user_id: int, level: int):
+        self._members[guild_id][user_id]["level"] = level
+        self._pending.setdefault((guild_id, user_id), [0.0, None])[1] = level
+
+    def forget(self, guild_id: int, user_id: t.Optional[int] = None):
+        """
+            Drops the cached view so the next message re-reads the stored values.
+
+            Pending XP increments are kept, pending level changes are discarded.
+        """
+        if user_id is None:
+            self._members.pop(guild_id, None)
+            keys = [key for key in self._pending if key[0] == guild_id]
+        else:
+            if members := self._members.get(guild_id):
+                members.pop(user_id, None)
+            keys = [(guild_id, user_id)]
+        for key in keys:
+            if pending := self._pending.get(key):
+                pending[1] = None
+
+    async def flush(self):
+        async with self._lock:
+            self._drop_settled(time.monotonic())
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            events, self._events = self._events, 0
+
+            increments: dict[int, dict[int, tuple[float, t.Optional[int]]]] = {}
+            for (guild_id, user_id), (xp, level) in pending.items():
+                increments.setdefault(guild_id, {})[user_id] = (xp, level)
+
+            try:
+                await self.database.apply_xp(increments)
+            except Exception:
+                # Put everything back so nothing is lost, the next flush will retry
+                for key, (xp, level) in pending.items():
+                    merged = self._pending.setdefault(key, [0.0, None])
+                    merged[0] += xp
+                    merged[1] = max(filter(None, (merged[1], level)), default=None)
+                self._events += events
+                raise
+
+            self.flushes += 1
+            self.flushed_events += events
+            # The database has caught up with these members, but a read that started before the write may still
+            # return the old row, so the views are only dropped once a flush interval has passed
+            now = time.monotonic()
+            for key in pending:
+                self._flushed.pop(key, None)
+                self._flushed[key] = now
+
+    def _drop_settled(self, now: float):
+        """Drops the views of members whose last flush is a flush interval old and who gained nothing since"""
+        while self._flushed:
+            key, flushed_at = next(iter(self._flushed.items()))
+            if now - flushed_at < self.flush_interval:
+                break
+            del self._flushed[key]
+            guild_id, user_id = key
+            if key not in self._pending and (members := self._members.get(guild_id)):
+                members.pop(user_id, None)
+                if not members:
+                    del self._members[guild_id]
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.warning("XP flush failed, retrying next cycle", exc_info=True)
+
+
+class XPCooldowns:
+    """
+        When each member last gained XP, as monotonic timestamps grouped by guild.
+
+        Expired entries are not removed one at a time on the message path; the whole table is swept at most once per
+        prune interval, dropping each guild's stale entries in bulk.
+    """
+    def __init__(self, prune_interval: float = 60.0):
+        self.prune_interval = prune_interval
+        self._last: dict[int, dict[int, float]] = {}
+        self._windows: dict[int, float] = {}
+        self._next_prune = time.monotonic() + prune_interval
+
+    def __len__(self):
+        return sum(len(members) for members in self._last.values())
+
+    def is_cooling(self, guild_id: int, user_id: int, window: float) -> bool:
+        if window <= 0:
+            return False
+        return time.monotonic() - self._last.get(guild_id, {}).get(user_id, -window) < window
+
+    def acquire(self, guild_id: int, user_id: int, window: float) -> bool:
+        """Records an XP gain and returns True, or returns False if the member is still cooling down"""
+        if window <= 0:
+            return True
+        now = time.monotonic()
+        members = self._last.setdefault(guild_id, {})
+        if now - members.get(user_id, -window) < window:
+            return False
+        members[user_id] = now
+        self._windows[guild_id] = window
+
+        if now >= self._next_prune:
+            self.prune(now)
+        return True
+
+    def prune(self, now: t.Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        for guild_id in list(self._last):
+            cutoff = now - self._windows.get(guild_id, 0.0)
+            members = self._last[guild_id]
+            self._last[guild_id] = {user_id: last for user_id, last in members.items() if last > cutoff}
+            if not self._last[guild_id]:
+                del self._last[guild_id]
+                self._windows.pop(guild_id, None)
+        self._next_prune = now + self.prune_interval
+
+    def forget(self, guild_id: int):
+        self._last.pop(guild_id, None)
+        self._windows.pop(guild_id, None)
+
+
+class XPLocks:
+    """
+        Active XP locks held in memory.
+
+        Each guild keeps a min-heap of (unlock time, user id), so checking a member on every message is a single
+        comparison against an integer timestamp, and a background task clears every expired lock in one write
+        instead of the message path doing it one member at a time.
+    """
+    def __init__(self, database: Database, interval: float = 30.0):
+        self.database = database
+        self.interval = interval
+        self._until: dict[int, dict[int, int]] = {}
+        self._heaps: dict[int, list[tuple[int, int]]] = {}
+        self._task: t.Optional[asyncio.Task] = None
+
+    def is_locked(self, guild_id: int, user_id: int) -> bool:
+        return self._until.get(guild_id, {}).get(user_id, 0) > time.time()
+
+    def locked_until(self, guild_id: int, user_id: int) -> t.Optional[dt.datetime]:
+        if (until := self._until.get(guild_id, {}).get(user_id, 0)) <= time.time():
+            return None
+        return dt.datetime.fromtimestamp(until, dt.timezone.utc)
+
+    def lock(self, guild_id: int, user_id: int, until: dt.datetime):
+        timestamp = int(until.timestamp())
+        self._until.setdefault(guild_id, {})[user_id] = timestamp
+        heapq.heappush(self._heaps.setdefault(guild_id, []), (timestamp, user_id))
+
+    def unlock(self, guild_id: int, user_id: int):
+        # The heap entry is left behind and skipped when it surfaces
+        self._until.get(guild_id, {}).pop(user_id, None)
+
+    def pop_expired(self) -> list[tuple[int, int]]:
+        now = time.time()
+        expired = []
+        for guild_id, heap in self._heaps.items():
+            until = self._until.get(guild_id, {})
+            while heap and heap[0][0] <= now:
+                timestamp, user_id = heapq.heappop(heap)
+                if until.get(user_id) == timestamp:
+                    del until[user_id]
+                    expired.append((guild_id, user_id))
+        for guild_id in [guild_id for guild_id, heap in self._heaps.items() if not heap]:
+            del self._heaps[guild_id]
+            self._until.pop(guild_id, None)
+        return expired
+
+    async def load(self, guild_id: t.Optional[int] = None):
+        """Replaces the held locks with the active ones in the database, for every guild or only the given one"""
+        locks = await self.database.get_active_locks()
+        if guild_id is None:
+            self._until.clear()
+            self._heaps.clear()
+        else:
+            self._until.pop(guild_id, None)
+            self._heaps.pop(guild_id, None)
+        for lock_guild_id, user_id, until in locks:
+            if guild_id is None or lock_guild_id == guild_id:
+                self.lock(lock_guild_id, user_id, until)
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if expired := self.pop_expired():
+                try:
+                    await self.database.expire_locks(expired)
+                except Exception:
+                    log.warning(f"Clearing {len(expired)} expired XP locks failed", exc_info=True)
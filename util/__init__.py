@@ -1,3 +1,5 @@
+import asyncio
+import importlib
 import os
 import typing as t
 import datetime as dt
@@ -15,6 +17,18 @@ TIME_REGEX = r"((?P<weeks>\d+)w)?((?P<days>\d+)d)?((?P<hours>\d+)h)?((?P<minutes
 DATETIME_FORMAT_STRING = "%Y-%m-%dT%H:%M:%SZ"
 
 
+def import_in_background(*modules: str) -> asyncio.Future:
+    """
+        Imports modules on the default executor so a slow import never runs on the event loop.
+
+        Await the returned future before importing any of the modules inside a command. Failed imports are
+        swallowed here and raise again at that import.
+    """
+    loop = asyncio.get_running_loop()
+    return asyncio.gather(*(loop.run_in_executor(None, importlib.import_module, module) for module in modules),
+                          return_exceptions=True)
+
+
 async def url_to_discord_file(url, file_name="image.txt"):
     async with aiohttp.ClientSession() as session:
         async with session.get(url) as resp:
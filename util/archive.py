@@ -0,0 +1,45 @@
+import gzip
+import io
+import json
+import typing as t
+
+# Room left under the limit for whatever gzip is still holding in its buffers when a part is checked
+SPLIT_MARGIN = 64 * 1024
+
+
+def build_ndjson_parts(records: t.Iterable[dict], limit: int, compress: bool = False) -> list[io.BytesIO]:
+    """
+        Writes records as NDJSON into in-memory buffers, starting a new buffer before one would pass the limit.
+
+        Each record is encoded and written on its own, so a part never holds more than one extra copy of a single
+        line. A record that could not fit in a part by itself is replaced by its numeric fields and the size that
+        was left out, so no part passes the limit. This is CPU bound and meant to be run in an executor.
+
+        Args:
+            records (Iterable[dict]): The records, one per line.
+            limit (int): The largest a part may get, in bytes.
+            compress (bool): Gzip every part.
+
+        Returns:
+            list[io.BytesIO]: The parts, each rewound to the start.
+    """
+    parts = []
+    raw = writer = None
+    for record in records:
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        if len(line) + SPLIT_MARGIN > limit:
+            note = {key: value for key, value in record.items() if isinstance(value, (int, float))}
+            line = json.dumps({**note, "omitted_bytes": len(line)}, separators=(",", ":")).encode("utf-8") + b"\n"
+        if raw is None or raw.tell() + len(line) + SPLIT_MARGIN > limit:
+            if writer is not raw:
+                writer.close()
+            raw = io.BytesIO()
+            writer = gzip.GzipFile(fileobj=raw, mode="wb") if compress else raw
+            parts.append(raw)
+        writer.write(line)
+
+    if writer is not None and writer is not raw:
+        writer.close()
+    for part in parts:
+        part.seek(0)
+    return parts
@@ -0,0 +1,44 @@
+import re
+import typing as t
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+class ImportTiming(t.NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    """
+        Parses the stderr of a `python -X importtime` run.
+
+        Args:
+            output (str): The captured stderr, lines that are not import timings are skipped.
+
+        Returns:
+            list[ImportTiming]: One entry per imported module, in the order the interpreter reported them.
+    """
+    timings = []
+    for line in output.splitlines():
+        if match := LINE.match(line):
+            self_us, cumulative_us, indent, module = match.groups()
+            # The interpreter indents each nested import by two spaces after the one space separator
+            timings.append(ImportTiming(module, int(self_us), int(cumulative_us), max(0, len(indent) - 1) // 2))
+    return timings
+
+
+def by_package(timings: t.Iterable[ImportTiming]) -> list[tuple[str, int]]:
+    """Returns (top-level package, total self time in microseconds), most expensive first"""
+    totals: dict[str, int] = {}
+    for timing in timings:
+        package = timing.module.partition(".")[0]
+        totals[package] = totals.get(package, 0) + timing.self_us
+    return sorted(totals.items(), key=lambda entry: entry[1], reverse=True)
+
+
+def cumulative(timings: t.Iterable[ImportTiming], module: str) -> int:
+    """The cumulative import time of a module in microseconds, 0 if it was already imported or never was"""
+    return next((timing.cumulative_us for timing in timings if timing.module == module), 0)
@@ -0,0 +1,138 @@
+import bisect
+import functools
+import math
+import typing as t
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+XP_PER_STEP = 42
+CURVE = 0.55
+# Below MIN_CURVE the step counts for the table run past what a float can tell apart (0.2 already needs 1000 ** 5)
+MIN_CURVE = 0.2
+MAX_CURVE = 0.95
+# XP per message is at most 10 times this, large enough for any event and small enough to keep levels readable
+MAX_MULTIPLIER = 100.0
+TABLE_LEVELS = 1000
+
+
+def clamp_curve(curve: float) -> float:
+    return min(max(curve, MIN_CURVE), MAX_CURVE)
+
+
+def _steps_for_level(level: int, curve: float) -> int:
+    # Smallest k where floor(k ** curve) >= level, bisected over the integers so float rounding around exact
+    # powers cannot leave it stepping one at a time
+    if level <= 0:
+        return 0
+    low, high = 0, max(1, math.ceil(level ** (1 / curve)))
+    while math.floor(high ** curve) < level:
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        if math.floor(middle ** curve) >= level:
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+def build_thresholds(levels: int = TABLE_LEVELS, curve: float = CURVE, xp_per_step: int = XP_PER_STEP) -> list[int]:
+    """
+        Builds the XP needed to reach each level.
+
+        Args:
+            levels (int): How many levels the table covers.
+            curve (float): The exponent of the level curve. level = floor((xp // xp_per_step) ** curve)
+            xp_per_step (int): The XP per curve step.
+
+        Returns:
+            list[int]: thresholds[n] is the minimum XP for level n.
+    """
+    return [_steps_for_level(level, curve) * xp_per_step for level in range(levels + 1)]
+
+
+@functools.lru_cache(maxsize=16)
+def thresholds(curve: float = CURVE) -> tuple[int, ...]:
+    return tuple(build_thresholds(curve=curve))
+
+
+def _level_from_formula(xp: float, curve: float) -> int:
+    return math.floor(int(xp // XP_PER_STEP) ** curve)
+
+
+def level_for_xp(xp: float, curve: float = CURVE) -> int:
+    """
+        Returns the level for an XP total with a binary search over the threshold table.
+
+        Args:
+            xp (float): The member's XP.
+            curve (float): The exponent of the level curve.
+
+        Returns:
+            int: The level.
+    """
+    table = thresholds(curve)
+    if xp >= table[-1]:
+        return _level_from_formula(xp, curve)
+    return bisect.bisect_right(table, xp) - 1
+
+
+def xp_for_level(level: int, curve: float = CURVE) -> int:
+    table = thresholds(curve)
+    if level < len(table):
+        return table[level]
+    return _steps_for_level(level, curve) * XP_PER_STEP
+
+
+def xp_to_next_level(xp: float, curve: float = CURVE) -> float:
+    return xp_for_level(level_for_xp(xp, curve) + 1, curve) - xp
+
+
+def progress_percent(xp: float, curve: float = CURVE) -> float:
+    """
+        Returns how far a member is through their current level.
+
+        Args:
+            xp (float): The member's XP.
+            curve (float): The exponent of the level curve.
+
+        Returns:
+            float: 0 to 100.
+    """
+    level = level_for_xp(xp, curve)
+    start = xp_for_level(level, curve)
+    end = xp_for_level(level + 1, curve)
+    return (xp - start) / (end - start) * 100
+
+
+def bulk_levels(xps: t.Sequence[float], curve: float = CURVE) -> list[int]:
+    """
+        Computes the level for many XP totals in one pass.
+
+        Uses a vectorized searchsorted over the threshold table when NumPy is installed, and falls back to the
+        bisect lookup otherwise. XP past the table uses the closed form, so the result matches level_for_xp exactly
+        and the work never grows with how much XP a member has.
+
+        Args:
+            xps (Sequence[float]): XP totals.
+            curve (float): The exponent of the level curve.
+
+        Returns:
+            list[int]: The level for each XP total, in the same order.
+    """
+    if not xps:
+        return []
+
+    if np is None:
+        return [level_for_xp(xp, curve) for xp in xps]
+
+    table = thresholds(curve)
+    levels = (np.searchsorted(np.asarray(table, dtype=np.float64), np.asarray(xps, dtype=np.float64),
+                              side="right") - 1).tolist()
+    for index, xp in enumerate(xps):
+        if xp >= table[-1]:
+            levels[index] = _level_from_formula(xp, curve)
+    return levels
@@ -0,0 +1,41 @@
+import functools
+import operator
+
+import discord
+
+from util import PERMISSION_DICT
+
+# Every bit discord.py knows a permission for, unknown bits in a raw value are never counted
+KNOWN_PERMISSIONS = functools.reduce(operator.or_, discord.Permissions.VALID_FLAGS.values(), 0)
+ADMINISTRATOR = discord.Permissions.VALID_FLAGS["administrator"]
+
+# (bit, label) in PERMISSION_DICT order, labels resolve through discord.py's flag names and their aliases
+PERMISSION_TABLE: tuple[tuple[int, str], ...] = tuple(
+    (discord.Permissions.VALID_FLAGS[name], label)
+    for label in PERMISSION_DICT
+    if (name := label.lower().replace(" ", "_")) in discord.Permissions.VALID_FLAGS
+)
+
+
+def permission_count(value: int) -> int:
+    """Number of known permissions set in a raw permission value"""
+    return bin(value & KNOWN_PERMISSIONS).count("1")
+
+
+@functools.lru_cache(maxsize=512)
+def permission_block(value: int) -> str:
+    """
+        Renders the described permissions set in a raw permission value, two to a line.
+
+        Roles in a guild tend to share a handful of permission sets, so rendered blocks are cached by value.
+
+        Args:
+            value (int): A raw permission value, or the XOR of two of them for a diff.
+
+        Returns:
+            str: The permissions as a code block.
+    """
+    labels = [label for bit, label in PERMISSION_TABLE if value & bit]
+    lines = [f"{labels[i]} - {labels[i + 1]} \n" if i + 1 < len(labels) else f"{labels[i]} - "
+             for i in range(0, len(labels), 2)]
+    return f"```{''.join(lines)}```"
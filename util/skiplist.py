@@ -0,0 +1,119 @@
+import math
+import random
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """
+        Sorted container with O(log n) insert, remove, rank lookup and positional access.
+
+        Every forward link stores how many elements it skips, which lets rank and index queries walk the same
+        O(log n) path a search does (see Pugh, "A Skip List Cookbook").
+    """
+    MAX_LEVEL = 24
+
+    def __init__(self):
+        self._nil = _Node(None, 0)
+        self._head = _Node(None, self.MAX_LEVEL)
+        self._head.next = [self._nil] * self.MAX_LEVEL
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def _random_level(self):
+        return min(self.MAX_LEVEL, 1 - int(math.log(1.0 - random.random(), 2)))
+
+    def insert(self, key):
+        chain = [None] * self.MAX_LEVEL
+        steps_at_level = [0] * self.MAX_LEVEL
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not self._nil and node.next[level].key < key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = self._random_level()
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - steps
+            previous.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.MAX_LEVEL):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain = [None] * self.MAX_LEVEL
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not self._nil and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target is self._nil or target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), self.MAX_LEVEL):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def index(self, key) -> int:
+        """Returns the zero based position of key"""
+        position = 0
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.next[level] is not self._nil and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+
+        if node.next[0] is self._nil or node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def _node_at(self, index: int) -> _Node:
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        remaining = index + 1
+        node = self._head
+        for level in reversed(range(self.MAX_LEVEL)):
+            while node.width[level] <= remaining and node.next[level] is not self._nil:
+                remaining -= node.width[level]
+                node = node.next[level]
+            if remaining == 0:
+                break
+        return node
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self._size
+        return self._node_at(index).key
+
+    def iter_from(self, index: int):
+        if index >= self._size:
+            return
+        node = self._node_at(index)
+        while node is not self._nil:
+            yield node.key
+            node = node.next[0]